@@ -0,0 +1,186 @@
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+ASSERTION_TYPES = ("contains", "regex", "json_path", "header", "max_latency_ms")
+# Assertions that need the response body, which is otherwise not read
+BODY_ASSERTIONS = ("contains", "regex", "json_path")
+
+_MISSING = object()
+_PATH_TOKEN = re.compile(r"\.([A-Za-z_][\w-]*)|\[(\d+)\]|\[(?:'([^']*)'|\"([^\"]*)\")\]")
+
+
+def parse_json_path(path: str) -> Tuple[Any, ...]:
+    """
+    Parses the JSONPath subset `$.a.b[0]['c d']` into a tuple of keys and indexes.
+    """
+    if not path.startswith("$"):
+        raise ValueError(f"JSONPath must start with '$': {path!r}")
+    steps = []
+    pos = 1
+    while pos < len(path):
+        match = _PATH_TOKEN.match(path, pos)
+        if match is None:
+            raise ValueError(f"Unsupported JSONPath syntax at {path[pos:]!r}")
+        name, index, single, double = match.groups()
+        if index is not None:
+            steps.append(int(index))
+        else:
+            steps.append(name if name is not None else (single if single is not None else double))
+        pos = match.end()
+    return tuple(steps)
+
+
+def resolve_json_path(document: Any, steps: Tuple[Any, ...]) -> Any:
+    for step in steps:
+        if isinstance(step, int):
+            if not isinstance(document, list) or step >= len(document):
+                return _MISSING
+        elif not isinstance(document, dict) or step not in document:
+            return _MISSING
+        document = document[step]
+    return document
+
+
+class CompiledAssertion:
+    """
+    One endpoint assertion with its regex or path parsed up front.
+    """
+
+    __slots__ = ("type", "value", "name", "path", "steps", "pattern")
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.type = rule.get("type")
+        self.value = rule.get("value")
+        self.name = rule.get("name")
+        self.path = rule.get("path")
+        self.steps: Tuple[Any, ...] = ()
+        self.pattern: Optional[re.Pattern] = None
+
+        if self.type not in ASSERTION_TYPES:
+            raise ValueError(f"Unknown assertion type {self.type!r}")
+        if self.type == "contains":
+            if not isinstance(self.value, str) or not self.value:
+                raise ValueError("'contains' needs a non-empty string value")
+        elif self.type == "regex":
+            if not isinstance(self.value, str):
+                raise ValueError("'regex' needs a pattern as value")
+            try:
+                self.pattern = re.compile(self.value)
+            except re.error as e:
+                raise ValueError(f"Invalid regex {self.value!r}: {e}")
+        elif self.type == "json_path":
+            if not self.path:
+                raise ValueError("'json_path' needs a path")
+            self.steps = parse_json_path(self.path)
+        elif self.type == "header":
+            if not self.name:
+                raise ValueError("'header' needs a header name")
+            self.name = self.name.lower()
+        elif self.type == "max_latency_ms":
+            if isinstance(self.value, bool) or not isinstance(self.value, (int, float)) or self.value <= 0:
+                raise ValueError("'max_latency_ms' needs a positive number as value")
+
+    def check(self, result: Dict[str, Any], text: Optional[str], document: Any) -> Optional[str]:
+        """
+        Returns None when the assertion holds, otherwise why it failed.
+        """
+        if self.type == "contains":
+            if text is None or self.value not in text:
+                return f"body does not contain {self.value!r}"
+        elif self.type == "regex":
+            if text is None or self.pattern.search(text) is None:
+                return f"body does not match /{self.value}/"
+        elif self.type == "json_path":
+            if document is _MISSING:
+                return f"{self.path}: body is not valid JSON"
+            found = resolve_json_path(document, self.steps)
+            if found is _MISSING:
+                return f"{self.path} not found"
+            if self.value is not None and found != self.value:
+                return f"{self.path} is {found!r}, expected {self.value!r}"
+        elif self.type == "header":
+            actual = result["headers"].get(self.name)
+            if actual is None:
+                return f"header {self.name} missing"
+            if self.value is not None and str(self.value) not in actual:
+                return f"header {self.name} is {actual!r}, expected {self.value!r}"
+        elif self.type == "max_latency_ms":
+            total = result["timings"]["total_ms"]
+            if total is not None and total > self.value:
+                return f"took {total:.0f}ms, limit {self.value}ms"
+        return None
+
+
+class CompiledAssertions:
+    """
+    An endpoint's assertion list, ready to evaluate against probe results.
+    """
+
+    __slots__ = ("rules", "needs_body")
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = [CompiledAssertion(rule) for rule in rules]
+        self.needs_body = any(rule.type in BODY_ASSERTIONS for rule in self.rules)
+
+    def evaluate(self, result: Dict[str, Any]) -> Optional[str]:
+        """
+        Runs every assertion and returns the failures joined, or None if all pass.
+        """
+        body = result.get("body")
+        text = body.decode(result.get("encoding") or "utf-8", errors="replace") if body is not None else None
+        document = _MISSING
+        if any(rule.type == "json_path" for rule in self.rules) and text is not None and not result["body_truncated"]:
+            try:
+                document = json.loads(text)
+            except ValueError:
+                pass
+
+        failures = [reason for reason in (rule.check(result, text, document) for rule in self.rules) if reason]
+        if not failures:
+            return None
+        if result["body_truncated"] and any(rule.type in BODY_ASSERTIONS for rule in self.rules):
+            failures.append("body exceeded max_body_bytes and was truncated")
+        return "Assertion failed: " + "; ".join(failures)
+
+
+NO_ASSERTIONS = CompiledAssertions([])
+
+
+class AssertionCache:
+    """
+    Compiled assertions per endpoint, rebuilt only when its config changes.
+
+    The endpoint cache replaces an endpoint's document on every config write,
+    so an entry stays valid for as long as it was built from the same list
+    object; checks never re-parse regexes or paths on each tick.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[str, Tuple[Any, CompiledAssertions]] = {}
+
+    def get(self, endpoint: Dict[str, Any]) -> CompiledAssertions:
+        rules = endpoint.get("assertions")
+        if not rules:
+            return NO_ASSERTIONS
+        endpoint_id = str(endpoint["_id"])
+        entry = self._compiled.get(endpoint_id)
+        if entry is not None and entry[0] is rules:
+            return entry[1]
+        try:
+            compiled = CompiledAssertions(rules)
+        except ValueError as e:
+            # Validated on write, so only hand-edited documents get here
+            print(f"Ignoring invalid assertions for endpoint {endpoint_id}: {e}")
+            compiled = NO_ASSERTIONS
+        self._compiled[endpoint_id] = (rules, compiled)
+        return compiled
+
+    def pop(self, endpoint_id: str):
+        self._compiled.pop(endpoint_id, None)
+
+    def __len__(self):
+        return len(self._compiled)
+
+
+assertion_cache = AssertionCache()
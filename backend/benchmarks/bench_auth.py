@@ -0,0 +1,98 @@
+"""
+Measures the per-request authentication overhead with and without the
+verified-token and endpoint-ownership caches.
+
+"uncached" clears the caches before every call, which is the cost every
+request paid before they existed: a full JWT decode plus an ownership query.
+"cached" is the steady state for a client reusing its token.
+
+Usage (from backend/; the ownership part needs a MongoDB server):
+    uv run python -m benchmarks.bench_auth --iterations 20000
+    uv run python -m benchmarks.bench_auth --skip-db
+    uv run python -m benchmarks.bench_auth --json results.json
+"""
+import os
+import time
+import json
+import asyncio
+import argparse
+import statistics
+
+
+async def timed(fn, iterations: int, reset=None):
+    samples = []
+    for _ in range(iterations):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p50_us": round(statistics.median(samples), 2),
+        "p99_us": round(samples[int(0.99 * (len(samples) - 1))], 2),
+    }
+
+
+def report(name: str, uncached, cached):
+    speedup = uncached["mean_us"] / cached["mean_us"] if cached["mean_us"] else float("inf")
+    print(
+        f"{name:>10}: uncached {uncached['mean_us']:9.2f} us (p99 {uncached['p99_us']:9.2f})  "
+        f"cached {cached['mean_us']:7.2f} us (p99 {cached['p99_us']:7.2f})  x{speedup:.0f}"
+    )
+    return {"uncached": uncached, "cached": cached, "speedup": round(speedup, 1)}
+
+
+async def main(args):
+    # Point the app at the scratch database before its modules read settings
+    os.environ["DATABASE_NAME"] = args.database
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    from datetime import timedelta
+    import handlers
+    from models import db
+    from services import AuthService, EndpointService, ownership_cache
+
+    email = "bench@example.com"
+    token = AuthService.create_access_token({"sub": email}, expires_delta=timedelta(hours=1))
+    results = {}
+
+    results["token"] = report(
+        "token",
+        await timed(lambda: handlers.get_current_user_email(token), args.iterations, handlers.token_cache.clear),
+        await timed(lambda: handlers.get_current_user_email(token), args.iterations),
+    )
+
+    if not args.skip_db:
+        inserted = await db.monitored_endpoints.insert_one({"name": "bench", "owner_email": email, "is_active": False})
+        endpoint_id = str(inserted.inserted_id)
+
+        async def request():
+            user_email = await handlers.get_current_user_email(token)
+            await EndpointService.verify_ownership(endpoint_id, user_email)
+
+        def reset():
+            handlers.token_cache.clear()
+            ownership_cache.clear()
+
+        db_iterations = min(args.iterations, args.db_iterations)
+        results["request"] = report(
+            "request",
+            await timed(request, db_iterations, reset),
+            await timed(request, db_iterations),
+        )
+        await db.client.drop_database(args.database)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "auth", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="api_monitor_bench")
+    parser.add_argument("--iterations", type=int, default=20000, help="Token verifications per variant")
+    parser.add_argument("--db-iterations", type=int, default=2000, help="Full requests per variant (hit Mongo)")
+    parser.add_argument("--skip-db", action="store_true", help="Only measure token verification")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    asyncio.run(main(parser.parse_args()))
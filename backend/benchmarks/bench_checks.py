@@ -0,0 +1,342 @@
+"""
+End-to-end load test of the check pipeline against a local fake target farm.
+
+Starts a set of local HTTP servers that answer with seeded, per-endpoint
+latency, error, timeout and slow-body behaviour, registers N endpoints
+through `EndpointService.bulk_apply`, then runs the real startup path
+(log writer, probe client, `MonitoringService` job loading and scheduling)
+for a fixed duration. Reports checks/sec, schedule lag percentiles, probe
+timing error (measured total_ms minus the latency the target injected),
+MongoDB commands per check, CPU time and RSS, and can write the results as
+JSON tagged with the current git commit for comparison across commits.
+
+MongoDB: pass --mongo-uri for a real server (a scratch database is used and
+dropped), or --mock-db to run in memory with the optional `mongomock-motor`
+package (DB command counts are not available in that mode). A run whose log
+writer failed to flush reports the failures and exits non-zero, since its
+timing numbers would be computed from missing logs.
+
+Usage (from backend/):
+    uv run python -m benchmarks.bench_checks --endpoints 2000 --duration 60
+    uv run python -m benchmarks.bench_checks --mock-db --endpoints 500 --interval 10 --duration 30
+    uv run python -m benchmarks.bench_checks --set CHECK_MAX_CONCURRENCY=500 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import subprocess
+from typing import Dict, List
+
+
+# --- Fake targets ---
+
+class TargetFarm:
+    """
+    Minimal HTTP/1.1 keep-alive servers on 127.0.0.1.
+
+    Endpoint i is served by port i % hosts, so the probe pool and per-host
+    limits see several origins. Each endpoint draws its outcomes from its own
+    seeded RNG, so a run is reproducible regardless of request interleaving.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.ports: List[int] = []
+        self._servers = []
+        self._rngs: Dict[int, random.Random] = {}
+        # endpoint index -> injected latency (ms) of each 200 response, in order
+        self.injected: Dict[int, List[float]] = {}
+        self.requests = 0
+
+    async def start(self):
+        for _ in range(self.args.hosts):
+            server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+            self._servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    def url(self, index: int) -> str:
+        return f"http://127.0.0.1:{self.ports[index % len(self.ports)]}/t/{index}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.decode("latin-1").split(" ")[1]
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b""):
+                        break
+                    if header.lower().startswith(b"content-length:"):
+                        length = int(header.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                if not await self._respond(path, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, path: str, writer: asyncio.StreamWriter) -> bool:
+        args = self.args
+        self.requests += 1
+        index = int(path.split("/")[2].split("?")[0])
+        rng = self._rngs.setdefault(index, random.Random(f"{args.seed}:{index}"))
+        roll = rng.random()
+        delay_ms = max(rng.gauss(args.latency_ms, args.jitter_ms), 0.0)
+        slow = rng.random() < args.slow_rate
+
+        if roll < args.timeout_rate:
+            # Never answer; the probe times out and drops the connection
+            await asyncio.sleep(args.probe_timeout + 1)
+            return False
+
+        status = "500 Internal Server Error" if roll < args.timeout_rate + args.error_rate else "200 OK"
+        await asyncio.sleep(delay_ms / 1000)
+        body = b'{"ok": true, "padding": "' + b"x" * args.body_bytes + b'"}'
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+        )
+        if slow:
+            # Headers first, then the body in chunks: TTFB stays low, total grows
+            chunks = 4
+            step = len(body) // chunks + 1
+            for i in range(0, len(body), step):
+                await writer.drain()
+                await asyncio.sleep(args.slow_body_ms / 1000 / chunks)
+                writer.write(body[i:i + step])
+            delay_ms += args.slow_body_ms
+        else:
+            writer.write(body)
+        await writer.drain()
+        if status == "200 OK":
+            self.injected.setdefault(index, []).append(delay_ms)
+        return True
+
+
+# --- Measurement helpers ---
+
+class LagRecorder:
+    """
+    Drop-in for the scheduler's lag histogram that keeps every sample.
+    """
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.samples.append(value)
+
+
+def percentiles(samples: List[float], scale: float = 1.0) -> Dict[str, float]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * scale, 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * scale, 3)}
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- Run ---
+
+def configure_environment(args):
+    """
+    Settings are read at import time, so overrides go into the environment
+    before any application module is imported.
+    """
+    os.environ["DATABASE_NAME"] = args.database
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["SHARDING_ENABLED"] = "false"
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+    for override in args.set:
+        key, _, value = override.partition("=")
+        os.environ[key] = value
+
+
+def use_mock_db():
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--mock-db needs the optional 'mongomock-motor' package (uv pip install mongomock-motor)")
+    from mongomock_motor import AsyncMongoMockCollection
+    from pymongo import UpdateOne
+
+    async def bulk_write(self, requests, ordered=True):
+        # mongomock's own bulk API rejects options newer pymongo sends (e.g. `sort`
+        # on UpdateOne); the data is in memory, so applying ops one by one is fine
+        for request in requests:
+            if not isinstance(request, UpdateOne):
+                raise NotImplementedError(f"--mock-db bulk_write does not support {type(request).__name__}")
+            await self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    AsyncMongoMockCollection.bulk_write = bulk_write
+    import models
+    models.client = AsyncMongoMockClient()
+    models.db = models.client[os.environ["DATABASE_NAME"]]
+    models.logs_collection = models.db[models.LOGS_COLLECTION]
+
+
+async def main(args):
+    configure_environment(args)
+    if args.mock_db:
+        use_mock_db()
+
+    import models
+    import check_scheduler as check_scheduler_module
+    from metrics import registry
+    from probe import probe_client
+    from log_writer import log_writer
+    from services import EndpointService, MonitoringService
+
+    farm = TargetFarm(args)
+    await farm.start()
+    lag = LagRecorder()
+    check_scheduler_module.schedule_lag = lag
+
+    if not args.mock_db:
+        await models.ensure_indexes()
+
+    owner = "bench@example.com"
+    operations = [
+        {"op": "create", "ref": str(i), "data": {
+            "name": f"target-{i}",
+            "url": farm.url(i),
+            "interval": args.interval,
+            "timeout": args.probe_timeout,
+        }}
+        for i in range(args.endpoints)
+    ]
+    started = time.perf_counter()
+    result = await EndpointService.bulk_apply(operations, owner)
+    register_seconds = time.perf_counter() - started
+    index_of = {r["id"]: int(r["ref"]) for r in result["results"] if r["error"] is None}
+    print(f"Registered {result['created']} endpoints in {register_seconds:.2f}s on {args.hosts} target hosts")
+
+    probe_count = registry.histogram("probe_duration_seconds", "")
+    db_commands = registry.histogram("mongo_command_seconds", "")
+    flush_errors = registry.counter("log_writer_flush_errors_total", "")
+
+    await probe_client.start()
+    await log_writer.start()
+    cpu_start, probes_start, commands_start = cpu_seconds(), probe_count.count, db_commands.count
+    run_start = time.perf_counter()
+    MonitoringService.start_loading()
+    await asyncio.sleep(args.duration)
+
+    await MonitoringService.stop_scheduler()
+    elapsed = time.perf_counter() - run_start
+    checks = probe_count.count - probes_start
+    commands = db_commands.count - commands_start
+    cpu = cpu_seconds() - cpu_start
+    await log_writer.stop()
+    await probe_client.close()
+
+    # Probe timing error: measured total_ms of each successful check against the
+    # latency the target injected for the same response
+    errors = []
+    async for log in models.logs_collection.find({"success": True}).sort("checked_at", 1):
+        index = index_of.get(log["endpoint_id"])
+        injected = farm.injected.get(index)
+        if not injected or not log.get("timings"):
+            continue
+        errors.append(log["timings"]["total_ms"] - injected.pop(0))
+
+    results = {
+        "checks": checks,
+        "checks_per_sec": round(checks / elapsed, 1),
+        "expected_checks_per_sec": round(args.endpoints / args.interval, 1),
+        "target_requests": farm.requests,
+        "schedule_lag_ms": percentiles(lag.samples, 1000),
+        "probe_timing_error_ms": percentiles(errors),
+        "db_commands_per_check": round(commands / checks, 2) if checks and not args.mock_db else None,
+        "cpu_seconds": round(cpu, 2),
+        "cpu_percent": round(cpu / elapsed * 100, 1),
+        "rss_mb": round(rss_mb(), 1),
+        "register_seconds": round(register_seconds, 2),
+        "log_writer_flush_errors": int(flush_errors.value),
+        "startup": MonitoringService.startup_stats,
+    }
+
+    print(
+        f"{results['checks_per_sec']} checks/s (expected {results['expected_checks_per_sec']})  "
+        f"lag p50/p99 {results['schedule_lag_ms']['p50']}/{results['schedule_lag_ms']['p99']} ms  "
+        f"timing error p50/p99 {results['probe_timing_error_ms']['p50']}/{results['probe_timing_error_ms']['p99']} ms  "
+        f"db cmds/check {results['db_commands_per_check']}  "
+        f"cpu {results['cpu_percent']}%  rss {results['rss_mb']} MB"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"benchmark": "checks", "commit": git_commit(), "params": vars(args), "results": results},
+                f, indent=2, default=str,
+            )
+
+    await farm.stop()
+    if not args.mock_db and not args.keep:
+        await models.client.drop_database(args.database)
+    if flush_errors.value:
+        sys.exit(f"Log writer failed {int(flush_errors.value)} flush(es); results above are not valid")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", help="MongoDB server to use (default: MONGO_URI from settings)")
+    parser.add_argument("--mock-db", action="store_true", help="Run against in-memory mongomock-motor")
+    parser.add_argument("--database", default="api_monitor_bench")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    parser.add_argument("--endpoints", type=int, default=2000)
+    parser.add_argument("--interval", type=int, default=30, help="Check interval in seconds (min 10)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run the scheduler")
+    parser.add_argument("--hosts", type=int, default=50, help="Fake target servers (distinct origins)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of 500 responses")
+    parser.add_argument("--timeout-rate", type=float, default=0.01, help="Share of requests never answered")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of responses with a trickled body")
+    parser.add_argument("--slow-body-ms", type=float, default=300)
+    parser.add_argument("--body-bytes", type=int, default=512)
+    parser.add_argument("--probe-timeout", type=int, default=5)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Override a setting")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,166 @@
+"""
+Compares the regular and time-series layouts for raw monitoring logs.
+
+Loads the same synthetic check history into both layouts in a scratch
+database and reports insert throughput, on-disk size and query latency for
+the access patterns the API uses.
+
+Usage (from backend/, against a MongoDB 6.0+ server):
+    uv run python -m benchmarks.bench_log_storage --endpoints 200 --checks 500
+    uv run python -m benchmarks.bench_log_storage --json results.json
+"""
+import time
+import json
+import random
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+
+from config import settings
+
+LAYOUTS = ("standard", "timeseries")
+
+
+def synthetic_logs(endpoints: int, checks: int, seed: int = 42):
+    rng = random.Random(seed)
+    endpoint_ids = [str(ObjectId()) for _ in range(endpoints)]
+    start = datetime.utcnow() - timedelta(seconds=60 * checks)
+    logs = []
+    for i in range(checks):
+        for endpoint_id in endpoint_ids:
+            success = rng.random() > 0.02
+            latency = rng.lognormvariate(5, 0.5)
+            logs.append({
+                "endpoint_id": endpoint_id,
+                "status_code": 200 if success else rng.choice([None, 500, 503]),
+                "response_time_ms": int(latency) if success else 0,
+                "success": success,
+                "error": None if success else "Timeout",
+                "timings": {
+                    "connect_ms": None,
+                    "tls_ms": None,
+                    "ttfb_ms": round(latency * 0.9, 2),
+                    "total_ms": round(latency, 2),
+                    "reused_connection": True,
+                },
+                "checked_at": start + timedelta(seconds=60 * i + rng.random()),
+            })
+    return endpoint_ids, logs
+
+
+async def prepare(db, name: str, layout: str):
+    await db.drop_collection(name)
+    if layout == "timeseries":
+        await db.create_collection(
+            name,
+            timeseries={"timeField": "checked_at", "metaField": "endpoint_id", "granularity": "seconds"},
+        )
+    await db[name].create_index([("endpoint_id", ASCENDING), ("checked_at", DESCENDING)])
+
+
+async def storage_stats(db, name: str):
+    stats = await db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(1)
+    storage = stats[0]["storageStats"] if stats else {}
+    return {
+        "storage_bytes": storage.get("storageSize", 0),
+        "index_bytes": storage.get("totalIndexSize", 0),
+    }
+
+
+async def timed(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+    }
+
+
+async def run_layout(db, layout: str, endpoint_ids, logs, batch_size: int, repeats: int):
+    name = f"bench_logs_{layout}"
+    await prepare(db, name, layout)
+    collection = db[name]
+
+    # Copies so _id assignment by the driver does not leak between layouts
+    docs = [dict(log) for log in logs]
+    start = time.perf_counter()
+    for i in range(0, len(docs), batch_size):
+        await collection.insert_many(docs[i:i + batch_size], ordered=False)
+    insert_seconds = time.perf_counter() - start
+
+    rng = random.Random(7)
+    newest = max(log["checked_at"] for log in logs)
+
+    async def latest_50():
+        await collection.find({"endpoint_id": rng.choice(endpoint_ids)}).sort("checked_at", -1).limit(50).to_list(50)
+
+    async def range_24h():
+        await collection.find({
+            "endpoint_id": rng.choice(endpoint_ids),
+            "checked_at": {"$gte": newest - timedelta(hours=24)},
+        }).to_list(None)
+
+    async def full_group():
+        await collection.aggregate([
+            {"$match": {"endpoint_id": rng.choice(endpoint_ids)}},
+            {"$group": {"_id": None, "avg": {"$avg": "$response_time_ms"}, "n": {"$sum": 1}}},
+        ]).to_list(1)
+
+    return {
+        "layout": layout,
+        "documents": len(docs),
+        "insert_docs_per_sec": round(len(docs) / insert_seconds),
+        **await storage_stats(db, name),
+        "latest_50": await timed(latest_50, repeats),
+        "range_24h": await timed(range_24h, repeats),
+        "full_group": await timed(full_group, repeats),
+    }
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.mongo_uri)
+    db = client[args.database]
+    endpoint_ids, logs = synthetic_logs(args.endpoints, args.checks)
+    print(f"Generated {len(logs)} logs for {len(endpoint_ids)} endpoints")
+
+    results = []
+    for layout in LAYOUTS:
+        result = await run_layout(db, layout, endpoint_ids, logs, args.batch_size, args.repeats)
+        results.append(result)
+        print(
+            f"{layout:>10}: {result['insert_docs_per_sec']:>8} docs/s  "
+            f"storage {result['storage_bytes'] / 1e6:8.2f} MB  index {result['index_bytes'] / 1e6:6.2f} MB  "
+            f"latest50 p50 {result['latest_50']['p50_ms']:.2f} ms  "
+            f"24h p50 {result['range_24h']['p50_ms']:.2f} ms  "
+            f"group p50 {result['full_group']['p50_ms']:.2f} ms"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "log_storage", "params": vars(args), "results": results}, f, indent=2)
+
+    if not args.keep:
+        await client.drop_database(args.database)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=settings.MONGO_URI)
+    parser.add_argument("--database", default="api_monitor_bench")
+    parser.add_argument("--endpoints", type=int, default=200)
+    parser.add_argument("--checks", type=int, default=500, help="Checks per endpoint")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50, help="Samples per query type")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,208 @@
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable, List, Hashable
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import settings
+from models import db
+
+# Only config writes from EndpointService touch `updated_at`; status updates
+# from the log writer do not, so they never wake the watcher.
+CONFIG_CHANGE_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"operationType": "update", "updateDescription.updatedFields.updated_at": {"$exists": True}},
+    ]}}
+]
+
+
+class TTLCache:
+    """
+    Bounded LRU map whose entries also expire after a per-entry TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EndpointConfigCache:
+    """
+    In-process cache of monitored endpoint documents keyed by id.
+
+    EndpointService writes through on create/update and invalidates on
+    delete, so a scheduled check reads its config from memory instead of
+    Mongo. Changes made by other processes are picked up from a change stream,
+    or by polling `updated_at` and the `endpoint_tombstones` left by deletes
+    when the server is a standalone instance; a full diff of the cached ids
+    runs only every ENDPOINT_CACHE_RECONCILE_INTERVAL to catch deletes made
+    outside EndpointService.
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[Callable[[str, Optional[Dict[str, Any]]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: Callable[[str, Optional[Dict[str, Any]]], None]):
+        """
+        Registers a callback run with (endpoint_id, doc) on remote changes; doc is None on delete.
+        """
+        self._listeners.append(listener)
+
+    def peek(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
+        return self._configs.get(endpoint_id)
+
+    async def get(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
+        endpoint = self._configs.get(endpoint_id)
+        if endpoint is None:
+            endpoint = await db.monitored_endpoints.find_one({"_id": ObjectId(endpoint_id)})
+            if endpoint is not None:
+                self._configs[endpoint_id] = endpoint
+        return endpoint
+
+    def items(self):
+        return list(self._configs.items())
+
+    def put(self, endpoint: Dict[str, Any]):
+        self._configs[str(endpoint["_id"])] = endpoint
+
+    def invalidate(self, endpoint_id: str):
+        self._configs.pop(endpoint_id, None)
+
+    def clear(self):
+        self._configs.clear()
+
+    async def record_deletes(self, endpoint_ids: List[str]):
+        """
+        Leaves a tombstone per deleted endpoint so polling workers see the delete.
+        """
+        if not endpoint_ids:
+            return
+        now = datetime.utcnow()
+        try:
+            await db.endpoint_tombstones.insert_many(
+                [{"endpoint_id": endpoint_id, "deleted_at": now} for endpoint_id in endpoint_ids], ordered=False
+            )
+        except PyMongoError as e:
+            # The periodic reconciliation still catches the delete
+            print(f"Failed to record endpoint tombstones: {e}")
+
+    def _apply(self, endpoint_id: str, endpoint: Optional[Dict[str, Any]]):
+        cached = self._configs.get(endpoint_id)
+        if endpoint is None:
+            if cached is None:
+                return
+            self.invalidate(endpoint_id)
+        else:
+            # Our own write-through already holds this version
+            if cached is not None and cached.get("updated_at") == endpoint.get("updated_at"):
+                return
+            self.put(endpoint)
+
+        for listener in self._listeners:
+            try:
+                listener(endpoint_id, endpoint)
+            except Exception as e:
+                print(f"Endpoint cache listener failed for {endpoint_id}: {e}")
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while settings.ENDPOINT_CACHE_CHANGE_STREAM:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                # Change streams need a replica set or sharded cluster
+                print(f"Endpoint cache: change stream unavailable ({e}); polling every {settings.ENDPOINT_CACHE_POLL_INTERVAL}s")
+                break
+            except PyMongoError as e:
+                print(f"Endpoint cache: change stream interrupted ({e}); reopening")
+                await asyncio.sleep(settings.ENDPOINT_CACHE_POLL_INTERVAL)
+        await self._poll()
+
+    async def _watch(self):
+        async with db.monitored_endpoints.watch(CONFIG_CHANGE_PIPELINE, full_document="updateLookup") as stream:
+            async for change in stream:
+                endpoint_id = str(change["documentKey"]["_id"])
+                if change["operationType"] == "delete":
+                    self._apply(endpoint_id, None)
+                else:
+                    self._apply(endpoint_id, change.get("fullDocument"))
+
+    async def _poll(self):
+        since = datetime.utcnow()
+        reconciled = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.ENDPOINT_CACHE_POLL_INTERVAL)
+            try:
+                polled_at = datetime.utcnow()
+                # Overlap the window to tolerate clock skew between workers
+                changed_since = since - timedelta(seconds=settings.ENDPOINT_CACHE_POLL_INTERVAL)
+                async for endpoint in db.monitored_endpoints.find({"updated_at": {"$gt": changed_since}}):
+                    self._apply(str(endpoint["_id"]), endpoint)
+                async for tombstone in db.endpoint_tombstones.find({"deleted_at": {"$gt": changed_since}}):
+                    self._apply(tombstone["endpoint_id"], None)
+                since = polled_at
+
+                if time.monotonic() - reconciled >= settings.ENDPOINT_CACHE_RECONCILE_INTERVAL:
+                    await self._reconcile()
+                    reconciled = time.monotonic()
+            except PyMongoError as e:
+                print(f"Endpoint cache poll failed: {e}")
+
+    async def _reconcile(self):
+        # Deletes that bypassed EndpointService leave no tombstone, so diff the cached ids
+        cached_ids = [ObjectId(eid) for eid in self._configs]
+        if not cached_ids:
+            return
+        present = {
+            str(doc["_id"])
+            async for doc in db.monitored_endpoints.find({"_id": {"$in": cached_ids}}, {"_id": 1})
+        }
+        for endpoint_id in [eid for eid in self._configs if eid not in present]:
+            self._apply(endpoint_id, None)
+
+
+endpoint_cache = EndpointConfigCache()
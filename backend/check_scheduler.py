@@ -0,0 +1,388 @@
+import time
+import heapq
+import asyncio
+import zlib
+from collections import deque
+from typing import Optional, Dict, Callable, Awaitable, Set, Iterable, Tuple, Deque
+from urllib.parse import urlsplit
+
+from config import settings
+from metrics import registry
+
+schedule_lag = registry.histogram(
+    "check_schedule_lag_seconds", "Delay between a check's planned and actual start"
+)
+skipped_runs = registry.counter(
+    "check_runs_skipped_total", "Runs skipped because the previous check was still in flight"
+)
+missed_runs = registry.counter(
+    "check_runs_missed_total", "Runs dropped because the scheduler fell more than one interval behind"
+)
+budget_waits = registry.counter(
+    "check_timeout_budget_waits_total", "Checks that waited because the in-flight timeout budget was spent"
+)
+
+
+def phase_offset(endpoint_id: str, interval: float) -> float:
+    """
+    Deterministic per-endpoint phase within its interval, so endpoints created
+    together do not fire in lockstep and keep the same slot across restarts.
+    """
+    return (zlib.crc32(endpoint_id.encode()) % 1_000_000) / 1_000_000 * interval
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CheckJob:
+    __slots__ = (
+        "endpoint_id", "base_interval", "interval", "timeout", "host", "next_run", "last_run",
+        "version", "running", "down", "down_since", "backoff_level", "confirm_left",
+    )
+
+    def __init__(self, endpoint_id: str, interval: float, host: str, timeout: float = 5.0):
+        self.endpoint_id = endpoint_id
+        self.base_interval = interval
+        # Effective interval after adaptive backoff or confirmation
+        self.interval = interval
+        self.timeout = timeout
+        self.host = host
+        self.next_run = 0.0
+        self.last_run: Optional[float] = None
+        self.version = 0
+        self.running = False
+        self.down = False
+        self.down_since = 0.0
+        self.backoff_level = 0
+        self.confirm_left = 0
+
+
+def adaptive_interval(job: CheckJob) -> float:
+    """
+    Interval for the job's next run under the adaptive policy.
+
+    Right after a threshold transition the next ADAPTIVE_CONFIRM_CHECKS runs
+    use ADAPTIVE_CONFIRM_INTERVAL, so a recovery (or a flap) is confirmed
+    quickly. An endpoint that has stayed down for ADAPTIVE_BACKOFF_AFTER
+    seconds backs off by ADAPTIVE_BACKOFF_FACTOR per check, up to
+    ADAPTIVE_MAX_INTERVAL. Otherwise the configured interval applies.
+    """
+    base = job.base_interval
+    if not settings.ADAPTIVE_SCHEDULING:
+        return base
+    if job.confirm_left > 0:
+        return min(base, settings.ADAPTIVE_CONFIRM_INTERVAL)
+    if job.backoff_level > 0:
+        ceiling = max(settings.ADAPTIVE_MAX_INTERVAL, base)
+        return min(base * settings.ADAPTIVE_BACKOFF_FACTOR ** job.backoff_level, ceiling)
+    return base
+
+
+class CheckScheduler:
+    """
+    Heap-based scheduler for endpoint checks.
+
+    Jobs are kept in a min-heap keyed by next run time (stale heap entries are
+    skipped lazily), so adding, rescheduling and firing a job is O(log n)
+    regardless of fleet size. Each endpoint fires at a deterministic phase
+    within its interval; execution is bounded by a global concurrency cap, a
+    token bucket per target host and a budget on the sum of the timeouts of
+    checks in flight, so slow or dead targets cannot hold every slot.
+    Intervals adapt to threshold state (see `adaptive_interval`).
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, CheckJob] = {}
+        self._heap = []
+        self._seq = 0
+        self._handler: Optional[Callable[[str], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: Set[asyncio.Task] = set()
+        self._budget_used = 0.0
+        self._budget_waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+        registry.gauge("check_scheduler_jobs", "Endpoints currently scheduled", fn=lambda: len(self._jobs))
+        registry.gauge("checks_in_flight", "Checks currently executing", fn=lambda: len(self._in_flight))
+        registry.gauge(
+            "check_timeout_budget_used_seconds", "Sum of the timeouts of checks in flight", fn=lambda: self._budget_used
+        )
+        registry.gauge(
+            "check_jobs_backed_off", "Down endpoints checked less often than configured",
+            fn=lambda: self._count(lambda job: job.backoff_level > 0),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, handler: Callable[[str], Awaitable[None]]):
+        if self.running:
+            return
+        self._handler = handler
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(settings.CHECK_MAX_CONCURRENCY)
+        self._budget_waiters.clear()
+        self._budget_used = 0.0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._in_flight):
+            task.cancel()
+        self._in_flight.clear()
+
+    def _push(self, job: CheckJob):
+        self._seq += 1
+        heapq.heappush(self._heap, (job.next_run, self._seq, job.endpoint_id, job.version))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _make_job(
+        self, endpoint_id: str, interval: float, url: str, timeout: float, down: bool, wall: float, mono: float
+    ) -> CheckJob:
+        existing = self._jobs.get(endpoint_id)
+        job = CheckJob(endpoint_id, interval, urlsplit(url).netloc, timeout)
+        if existing is not None:
+            job.version = existing.version + 1
+            job.running = existing.running
+            job.last_run = existing.last_run
+            # A config edit keeps the adaptive state; backoff restarts from the new interval
+            job.down, job.down_since, job.confirm_left = existing.down, existing.down_since, existing.confirm_left
+        elif down:
+            # Down on load: how long it has been down is unknown, so the grace period starts now
+            job.down, job.down_since = True, mono
+        job.interval = adaptive_interval(job)
+
+        if job.interval == interval:
+            delay = (phase_offset(endpoint_id, interval) - wall) % interval
+        else:
+            delay = max((job.last_run or mono) + job.interval - mono, 0)
+        job.next_run = mono + delay
+        self._jobs[endpoint_id] = job
+        return job
+
+    def add(self, endpoint_id: str, interval: float, url: str = "", timeout: float = 5.0, down: bool = False):
+        """
+        Adds or replaces the job for an endpoint. `down` is its stored
+        threshold state, which the adaptive policy starts from.
+        """
+        job = self._make_job(endpoint_id, interval, url, timeout, down, time.time(), time.monotonic())
+        self._push(job)
+
+    def add_many(self, jobs: Iterable[Tuple[str, float, str, float, bool]]):
+        """
+        Adds or replaces many (endpoint_id, interval, url, timeout, down) jobs
+        with a single heap rebuild and one wakeup. Phases still come from
+        `phase_offset`, so a large import is spread across each interval
+        rather than firing at once.
+        """
+        wall, mono = time.time(), time.monotonic()
+        added = 0
+        for endpoint_id, interval, url, timeout, down in jobs:
+            job = self._make_job(endpoint_id, interval, url, timeout, down, wall, mono)
+            self._seq += 1
+            self._heap.append((job.next_run, self._seq, job.endpoint_id, job.version))
+            added += 1
+        if not added:
+            return
+        heapq.heapify(self._heap)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove(self, endpoint_id: str):
+        self._jobs.pop(endpoint_id, None)
+
+    def record_outcome(self, endpoint_id: str, down: bool):
+        """
+        Feeds a check's threshold state into the adaptive policy and moves the
+        job's next run if its interval changed.
+        """
+        job = self._jobs.get(endpoint_id)
+        if job is None:
+            return
+        now = time.monotonic()
+        if down != job.down:
+            job.down = down
+            job.down_since = now
+            job.backoff_level = 0
+            job.confirm_left = settings.ADAPTIVE_CONFIRM_CHECKS
+        elif job.confirm_left > 0:
+            job.confirm_left -= 1
+        elif down and now - job.down_since >= settings.ADAPTIVE_BACKOFF_AFTER:
+            if adaptive_interval(job) < max(settings.ADAPTIVE_MAX_INTERVAL, job.base_interval):
+                job.backoff_level += 1
+
+        interval = adaptive_interval(job)
+        if interval == job.interval:
+            return
+        job.interval = interval
+        job.version += 1
+        if interval == job.base_interval:
+            # Back on the configured interval: return to the endpoint's phase slot
+            delay = (phase_offset(endpoint_id, interval) - time.time()) % interval
+            job.next_run = now + delay
+        else:
+            job.next_run = max((job.last_run or now) + interval, now)
+        self._push(job)
+
+    def clear(self):
+        self._jobs.clear()
+        self._heap.clear()
+
+    def has_job(self, endpoint_id: str) -> bool:
+        return endpoint_id in self._jobs
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _count(self, predicate: Callable[[CheckJob], bool]) -> int:
+        return sum(1 for job in self._jobs.values() if predicate(job))
+
+    def _host_bucket(self, host: str) -> Optional[TokenBucket]:
+        if not host or settings.CHECK_HOST_RATE_LIMIT <= 0:
+            return None
+        bucket = self._host_buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(settings.CHECK_HOST_RATE_LIMIT, settings.CHECK_HOST_BURST)
+            self._host_buckets[host] = bucket
+        return bucket
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                planned, _, endpoint_id, version = heapq.heappop(self._heap)
+                job = self._jobs.get(endpoint_id)
+                if job is None or job.version != version:
+                    continue
+                job.last_run = planned
+                self._fire(job, planned)
+
+                # Fixed-rate schedule; drop slots we are already past
+                job.next_run = planned + job.interval
+                while job.next_run <= now:
+                    job.next_run += job.interval
+                    missed_runs.inc()
+                self._push(job)
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, job: CheckJob, planned: float):
+        if job.running:
+            skipped_runs.inc()
+            return
+        job.running = True
+        task = asyncio.create_task(self._execute(job, planned))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    def _fits_budget(self, timeout: float) -> bool:
+        # Always admit a check when nothing holds budget, so an oversized timeout still runs
+        return not self._budget_used or self._budget_used + timeout <= settings.CHECK_TIMEOUT_BUDGET
+
+    async def _reserve_budget(self, timeout: float) -> float:
+        """
+        Waits until the check's timeout fits in CHECK_TIMEOUT_BUDGET. Waiters
+        are admitted in order, so checks with long timeouts are not starved
+        by a stream of short ones.
+        """
+        if settings.CHECK_TIMEOUT_BUDGET <= 0:
+            return 0.0
+        if not self._budget_waiters and self._fits_budget(timeout):
+            self._budget_used += timeout
+            return timeout
+
+        budget_waits.inc()
+        waiter = asyncio.get_running_loop().create_future()
+        self._budget_waiters.append((timeout, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation landed
+                self._release_budget(timeout)
+            raise
+        return timeout
+
+    def _release_budget(self, reserved: float):
+        self._budget_used = max(self._budget_used - reserved, 0.0)
+        while self._budget_waiters:
+            timeout, waiter = self._budget_waiters[0]
+            if waiter.done():
+                self._budget_waiters.popleft()
+                continue
+            if not self._fits_budget(timeout):
+                break
+            self._budget_waiters.popleft()
+            self._budget_used += timeout
+            waiter.set_result(None)
+
+    async def _execute(self, job: CheckJob, planned: float):
+        reserved = 0.0
+        try:
+            # Wait for the host's token first, so a rate-limited host holds neither
+            # budget nor a concurrency slot while other hosts are ready to go
+            bucket = self._host_bucket(job.host)
+            if bucket is not None:
+                await bucket.acquire()
+            reserved = await self._reserve_budget(job.timeout)
+            async with self._semaphore:
+                schedule_lag.observe(max(time.monotonic() - planned, 0))
+                await self._handler(job.endpoint_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Check for {job.endpoint_id} failed: {e}")
+        finally:
+            if reserved:
+                self._release_budget(reserved)
+            job.running = False
+            current = self._jobs.get(job.endpoint_id)
+            if current is not None:
+                current.running = False
+
+    def stats(self):
+        return {
+            "jobs": len(self._jobs),
+            "in_flight": len(self._in_flight),
+            "schedule_lag_seconds": schedule_lag.snapshot(),
+            "skipped_runs": skipped_runs.value,
+            "missed_runs": missed_runs.value,
+            "timeout_budget_used_seconds": self._budget_used,
+            "timeout_budget_waits": budget_waits.value,
+            "backed_off": self._count(lambda job: job.backoff_level > 0),
+            "confirming": self._count(lambda job: job.confirm_left > 0),
+        }
+
+
+check_scheduler = CheckScheduler()
@@ -0,0 +1,193 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from config import settings
+from models import db, logs_collection
+from metrics import registry
+from rollups import RollupAccumulator, bucket_start, merge_rollups, rollup_replacement
+
+compacted_hours = registry.counter("log_compaction_hours_total", "Hours of raw logs checked by the compactor")
+compacted_logs = registry.counter("log_compaction_logs_total", "Raw logs folded into summaries by the compactor")
+rebuilt_days = registry.counter("log_compaction_days_rebuilt_total", "Day summaries rebuilt from their hour summaries")
+
+STATE_ID = "log_compaction"
+# Hours this recent are still being rolled up by the log writer
+SETTLE = timedelta(hours=1)
+# Kept between the first compacted hour and the retention horizon: the TTL
+# monitor runs every 60s, so logs right at the horizon can vanish mid-read
+EXPIRY_MARGIN = timedelta(minutes=5)
+# Endpoint ids per $in query
+ID_CHUNK = 1000
+
+
+class LogCompactor:
+    """
+    Incrementally compacts raw logs into hour and day summaries before the
+    raw-log TTL removes them.
+
+    The log writer already rolls up every batch it flushes, so in steady
+    state this only repairs (endpoint, hour) summaries whose check count
+    differs from the raw logs: history written before rollups existed, or
+    hours where part of a rollup write failed. It walks forward one hour at
+    a time from a watermark stored in `maintenance_state`, rebuilds those
+    summaries from the hour's logs (read through the index in small batches
+    with pauses) and overwrites them, so redoing an hour is harmless. Once a
+    day is passed, its day summaries are compared with the sum of its hour
+    summaries and rebuilt from them where they differ. A lease on the same
+    document keeps workers from compacting the same hour twice.
+    """
+
+    def __init__(self):
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def run(self):
+        state = await self._claim()
+        if state is None:
+            return
+        started = datetime.utcnow()
+        # First whole hour that starts at least EXPIRY_MARGIN inside the horizon
+        horizon = bucket_start(
+            started - timedelta(days=settings.LOG_RETENTION_DAYS) + EXPIRY_MARGIN, "hour"
+        ) + timedelta(hours=1)
+        hour = max(state.get("watermark") or horizon, horizon)
+        limit = bucket_start(started - SETTLE, "hour")
+        hours = logs = 0
+        try:
+            while hour < limit and hours < settings.COMPACTION_MAX_HOURS:
+                logs += await self._compact_hour(hour)
+                hour += timedelta(hours=1)
+                hours += 1
+                compacted_hours.inc()
+                if hour == bucket_start(hour, "day"):
+                    await self._reconcile_day(hour - timedelta(days=1), horizon)
+                await self._save(hour)
+        except PyMongoError as e:
+            print(f"Log compaction stopped at {hour.isoformat()}: {e}")
+        finally:
+            await self._release()
+        self.last_run = {"at": started, "hours": hours, "logs": logs, "watermark": hour}
+        if logs:
+            print(f"Compacted {logs} raw logs across {hours} hour(s) into summaries")
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        try:
+            return await db.maintenance_state.find_one_and_update(
+                {"_id": STATE_ID, "$or": [{"locked_until": {"$lt": now}}, {"locked_until": None}]},
+                {"$set": {"locked_until": now + timedelta(seconds=settings.COMPACTION_INTERVAL)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Another worker holds the lease
+            return None
+
+    async def _save(self, watermark: datetime):
+        await db.maintenance_state.update_one(
+            {"_id": STATE_ID},
+            {"$set": {
+                "watermark": watermark,
+                "locked_until": datetime.utcnow() + timedelta(seconds=settings.COMPACTION_INTERVAL),
+            }},
+        )
+
+    async def _release(self):
+        try:
+            await db.maintenance_state.update_one({"_id": STATE_ID}, {"$set": {"locked_until": None}})
+        except PyMongoError:
+            pass  # the lease expires on its own
+
+    async def _summary_counts(self, endpoint_ids: List[str], granularity: str, start: datetime, end: datetime) -> Dict[str, int]:
+        """
+        Checks counted by each endpoint's summaries of one tier in [start, end).
+        """
+        counts: Dict[str, int] = {}
+        for i in range(0, len(endpoint_ids), ID_CHUNK):
+            cursor = db.monitoring_rollups.find(
+                {
+                    "endpoint_id": {"$in": endpoint_ids[i:i + ID_CHUNK]},
+                    "granularity": granularity,
+                    "bucket_start": {"$gte": start, "$lt": end},
+                },
+                {"endpoint_id": 1, "count": 1, "_id": 0},
+            )
+            async for doc in cursor:
+                counts[doc["endpoint_id"]] = counts.get(doc["endpoint_id"], 0) + doc.get("count", 0)
+        return counts
+
+    async def _compact_hour(self, hour: datetime) -> int:
+        end = hour + timedelta(hours=1)
+        window = {"checked_at": {"$gte": hour, "$lt": end}}
+        raw_counts = {
+            doc["_id"]: doc["count"]
+            async for doc in logs_collection.aggregate([
+                {"$match": window},
+                {"$group": {"_id": "$endpoint_id", "count": {"$sum": 1}}},
+            ])
+        }
+        summarized = await self._summary_counts(list(raw_counts), "hour", hour, end)
+        stale = [endpoint_id for endpoint_id, count in raw_counts.items() if summarized.get(endpoint_id) != count]
+        if not stale:
+            return 0
+
+        acc = RollupAccumulator(("hour",))
+        count = 0
+        for i in range(0, len(stale), ID_CHUNK):
+            cursor = logs_collection.find(
+                {"endpoint_id": {"$in": stale[i:i + ID_CHUNK]}, **window},
+                {"endpoint_id": 1, "checked_at": 1, "success": 1, "status_code": 1, "response_time_ms": 1, "error": 1},
+                batch_size=settings.COMPACTION_BATCH_SIZE,
+            )
+            async for log in cursor:
+                acc.add(log)
+                count += 1
+                if count % settings.COMPACTION_BATCH_SIZE == 0:
+                    await asyncio.sleep(settings.COMPACTION_PAUSE)
+
+        await self._write(acc.replacements())
+        compacted_logs.inc(count)
+        return count
+
+    async def _reconcile_day(self, day: datetime, horizon: datetime):
+        """
+        Rebuilds the day summaries of a finished day that disagree with its
+        hour summaries, e.g. after a partial or repeated rollup write.
+        """
+        end = day + timedelta(days=1)
+        endpoint_ids = await logs_collection.distinct("endpoint_id", {"checked_at": {"$gte": max(day, horizon), "$lt": end}})
+        hour_counts = await self._summary_counts(endpoint_ids, "hour", day, end)
+        day_counts = await self._summary_counts(endpoint_ids, "day", day, end)
+        stale = [endpoint_id for endpoint_id in endpoint_ids if hour_counts.get(endpoint_id) != day_counts.get(endpoint_id)]
+
+        updates = []
+        for i in range(0, len(stale), ID_CHUNK):
+            grouped: Dict[str, List[Dict[str, Any]]] = {}
+            cursor = db.monitoring_rollups.find({
+                "endpoint_id": {"$in": stale[i:i + ID_CHUNK]},
+                "granularity": "hour",
+                "bucket_start": {"$gte": day, "$lt": end},
+            })
+            async for doc in cursor:
+                grouped.setdefault(doc["endpoint_id"], []).append(doc)
+            for endpoint_id, docs in grouped.items():
+                merged = merge_rollups(docs)
+                merged["count"] = merged.pop("total")
+                updates.append(rollup_replacement(endpoint_id, "day", day, merged))
+            await asyncio.sleep(settings.COMPACTION_PAUSE)
+        await self._write(updates)
+        rebuilt_days.inc(len(updates))
+
+    async def _write(self, updates: list):
+        for i in range(0, len(updates), settings.COMPACTION_BATCH_SIZE):
+            await db.monitoring_rollups.bulk_write(updates[i:i + settings.COMPACTION_BATCH_SIZE], ordered=False)
+            await asyncio.sleep(settings.COMPACTION_PAUSE)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": settings.COMPACTION_ENABLED, "last_run": self.last_run}
+
+
+log_compactor = LogCompactor()
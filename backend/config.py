@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import Field, model_validator
+from typing import Literal
 
 class Settings(BaseSettings):
     MONGO_URI: str = "mongodb://localhost:27017"
@@ -9,6 +10,20 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(..., description="Secret key for JWT. Must be set in .env")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Verified-token and endpoint-ownership caches on the auth hot path
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL: float = 300.0
+    OWNERSHIP_CACHE_SIZE: int = 50000
+    OWNERSHIP_CACHE_TTL: float = 60.0
+
+    # bcrypt runs on its own thread pool; excess requests get a 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Event-loop lag sampling
+    LOOP_MONITOR_INTERVAL: float = 0.5
+    LOOP_BLOCKED_THRESHOLD: float = 0.05
     
     # SMTP Settings for Email Notifications
     SMTP_HOST: str = "smtp.gmail.com"
@@ -16,7 +31,100 @@ class Settings(BaseSettings):
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
     EMAILS_FROM: str = "noreply@apimonitor.com"
-    
+
+    # Raw monitoring logs older than this are removed by a TTL index
+    LOG_RETENTION_DAYS: int = 7
+    # "timeseries" stores logs in a MongoDB 6.0+ time-series collection
+    LOG_STORAGE: Literal["standard", "timeseries"] = "standard"
+    # Summary tiers outlive raw logs; raw hours without a summary are compacted into them
+    ROLLUP_HOUR_RETENTION_DAYS: int = 90
+    ROLLUP_DAY_RETENTION_DAYS: int = 730
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_INTERVAL: float = 300.0
+    COMPACTION_MAX_HOURS: int = 24  # hours examined per run
+    COMPACTION_BATCH_SIZE: int = 1000
+    COMPACTION_PAUSE: float = 0.05  # seconds between batches
+
+    # Probe HTTP client (shared connection pool)
+    PROBE_MAX_CONNECTIONS: int = 500
+    PROBE_MAX_KEEPALIVE_CONNECTIONS: int = 200
+    PROBE_MAX_CONNECTIONS_PER_HOST: int = 10
+    PROBE_KEEPALIVE_EXPIRY: float = 30.0
+    PROBE_HTTP2: bool = False
+    # Body bytes read for content assertions unless an endpoint sets max_body_bytes
+    PROBE_MAX_BODY_BYTES: int = 1048576
+    # Bodies up to this size are read to the end even when unused, so the
+    # connection can go back to the pool instead of being closed
+    PROBE_DRAIN_BYTES: int = 65536
+    # Shared DNS cache for probes; record TTLs are used when dnspython is installed
+    DNS_CACHE_ENABLED: bool = True
+    DNS_CACHE_SIZE: int = 10000
+    DNS_CACHE_TTL: float = 60.0
+    DNS_CACHE_MAX_TTL: float = 300.0
+    DNS_NEGATIVE_TTL: float = 10.0
+
+    # Write-behind log writer
+    LOG_WRITER_BATCH_SIZE: int = 500
+    LOG_WRITER_FLUSH_INTERVAL: float = 1.0
+    LOG_WRITER_MAX_QUEUE: int = 10000
+    # Connection errors are retried with exponential backoff before a write is given up
+    LOG_WRITER_MAX_RETRIES: int = 3
+    LOG_WRITER_RETRY_BACKOFF: float = 0.5
+
+    # Check scheduler
+    CHECK_MAX_CONCURRENCY: int = 200
+    CHECK_HOST_RATE_LIMIT: float = 10.0  # checks per second per target host, 0 disables
+    CHECK_HOST_BURST: int = 20
+    # Sum of the timeouts of checks in flight, in seconds; 0 disables
+    CHECK_TIMEOUT_BUDGET: float = 1000.0
+
+    # Adaptive intervals: back off endpoints that stay down, confirm transitions quickly
+    ADAPTIVE_SCHEDULING: bool = True
+    ADAPTIVE_BACKOFF_AFTER: float = 300.0  # seconds down before backing off
+    ADAPTIVE_BACKOFF_FACTOR: float = 2.0
+    ADAPTIVE_MAX_INTERVAL: float = 900.0
+    ADAPTIVE_CONFIRM_INTERVAL: float = 10.0
+    ADAPTIVE_CONFIRM_CHECKS: int = 3
+
+    # Sharding checks across workers (leases in the worker_leases collection)
+    SHARDING_ENABLED: bool = False
+    WORKER_ID: str = ""
+    SHARD_HEARTBEAT_INTERVAL: float = 5.0
+    SHARD_LEASE_TTL: float = 15.0
+    SHARD_VNODES: int = 128
+
+    # Seconds a computed /dashboard response is reused for the same user
+    DASHBOARD_CACHE_TTL: float = 10.0
+
+    # Live event stream (/stream)
+    STREAM_SUBSCRIBER_BUFFER: int = 100
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+
+    # Endpoints read per batch when registering jobs at startup
+    STARTUP_LOAD_BATCH_SIZE: int = 500
+
+    # Endpoint config cache
+    ENDPOINT_CACHE_CHANGE_STREAM: bool = True
+    ENDPOINT_CACHE_POLL_INTERVAL: float = 15.0
+    ENDPOINT_CACHE_RECONCILE_INTERVAL: float = 3600.0  # full diff of cached ids while polling
+
+    # Alert delivery (email/Slack)
+    NOTIFY_QUEUE_SIZE: int = 10000
+    NOTIFY_DIGEST_WINDOW: float = 10.0  # seconds alerts to one destination are grouped, 0 sends at once
+    NOTIFY_MAX_CONCURRENCY: int = 20
+    NOTIFY_MAX_RETRIES: int = 4
+    NOTIFY_RETRY_BACKOFF: float = 2.0
+    NOTIFY_SEND_TIMEOUT: float = 10.0
+    NOTIFY_SMTP_POOL_SIZE: int = 2
+    NOTIFY_SMTP_IDLE_TIMEOUT: float = 120.0
+
+    @model_validator(mode="after")
+    def check_shard_lease(self):
+        # Workers release their endpoints two heartbeats before their lease expires
+        if self.SHARD_LEASE_TTL <= 2 * self.SHARD_HEARTBEAT_INTERVAL:
+            raise ValueError("SHARD_LEASE_TTL must be more than twice SHARD_HEARTBEAT_INTERVAL")
+        return self
+
     class Config:
         env_file = ".env"
 
@@ -1,13 +1,21 @@
+import time
+import hashlib
 from fastapi import HTTPException, status, Depends
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from jose import JWTError, jwt
 
 from config import settings
 from models import (
     UserCreate, Token, EndpointCreate, EndpointResponse, 
-    EndpointUpdate, MonitoringLogResponse
+    EndpointUpdate, MonitoringLogResponse, BulkEndpointRequest
 )
-from services import AuthService, EndpointService
+from services import AuthService, EndpointService, parse_import_rows
+from pubsub import broker
+from cache import TTLCache
+
+# sha256(token) -> email for tokens that already passed signature and expiry checks
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
 
 # --- Dependencies ---
 async def get_current_user_email(token: str):
@@ -16,15 +24,26 @@ async def get_current_user_email(token: str):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    key = hashlib.sha256(token.encode()).digest()
+    email = token_cache.get(key)
+    if email is not None:
+        return email
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        return email
     except JWTError:
         raise credentials_exception
 
+    # Never serve a token from the cache past its own expiry
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, email, ttl)
+    return email
+
 # --- Auth Handlers ---
 async def register(user: UserCreate):
     await AuthService.create_user(user.email, user.password)
@@ -49,9 +68,72 @@ async def update_endpoint(id: str, endpoint_update: EndpointUpdate, user_email:
 async def delete_endpoint(id: str, user_email: str):
     await EndpointService.delete_endpoint(id, user_email)
 
+async def bulk_endpoints(request: BulkEndpointRequest, user_email: str):
+    operations = [{"op": "create", "ref": f"create[{i}]", "data": row} for i, row in enumerate(request.create)]
+    for i, row in enumerate(request.update):
+        data = dict(row)
+        endpoint_id = data.pop("id", None)
+        operations.append({"op": "update", "ref": f"update[{i}]", "id": str(endpoint_id) if endpoint_id else None, "data": data})
+    operations += [{"op": "delete", "ref": f"delete[{i}]", "id": endpoint_id} for i, endpoint_id in enumerate(request.delete)]
+    return await EndpointService.bulk_apply(operations, user_email)
+
+async def import_endpoints(content: bytes, filename: str, user_email: str):
+    return await EndpointService.bulk_apply(parse_import_rows(content, filename), user_email)
+
+# --- Dashboard Handlers ---
+async def get_dashboard(user_email: str):
+    return await EndpointService.get_dashboard(user_email)
+
+# --- Live Stream Handlers ---
+async def stream_events(user_email: str):
+    """
+    Yields Server-Sent Events for the user's checks, with periodic keep-alives.
+    """
+    subscription = broker.subscribe(user_email)
+    try:
+        yield ": connected\n\n"
+        while not subscription.closed.is_set():
+            frame = await subscription.next_frame(settings.STREAM_HEARTBEAT_SECONDS)
+            yield frame if frame is not None else ": ping\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
 # --- Stats Handlers ---
-async def get_logs(endpoint_id: str, user_email: str, limit: int = 50):
-    return await EndpointService.get_logs(endpoint_id, user_email, limit)
+async def get_logs(
+    endpoint_id: str,
+    user_email: str,
+    limit: int = 50,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+):
+    return await EndpointService.get_logs(endpoint_id, user_email, limit, start, end, cursor)
+
+async def export_logs(
+    endpoint_id: str,
+    user_email: str,
+    fmt: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    return await EndpointService.export_logs(endpoint_id, user_email, fmt, start, end)
+
+async def get_stats(
+    endpoint_id: str,
+    user_email: str,
+    range_key: str = "7d",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    return await EndpointService.get_stats(endpoint_id, user_email, range_key, start, end)
 
-async def get_stats(endpoint_id: str, user_email: str):
-    return await EndpointService.get_stats(endpoint_id, user_email)
\ No newline at end of file
+async def get_series(
+    endpoint_id: str,
+    user_email: str,
+    range_key: str = "24h",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = 300,
+    mode: str = "buckets",
+):
+    return await EndpointService.get_series(endpoint_id, user_email, range_key, start, end, points, mode)
\ No newline at end of file
@@ -0,0 +1,200 @@
+import time
+import asyncio
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from config import settings
+from models import db, logs_collection
+from metrics import registry
+from rollups import RollupService
+
+flush_latency = registry.histogram(
+    "log_writer_flush_seconds", "Time spent writing one batch of logs and status updates"
+)
+flushed_logs = registry.counter("log_writer_logs_written_total", "Monitoring logs written to Mongo")
+flushed_updates = registry.counter(
+    "log_writer_status_updates_total", "Endpoint status updates written to Mongo"
+)
+flush_errors = registry.counter(
+    "log_writer_flush_errors_total", "Log, rollup or status writes that failed, in whole or in part"
+)
+flush_retries = registry.counter("log_writer_flush_retries_total", "Writes retried after a connection error")
+
+
+class LogWriter:
+    """
+    Write-behind pipeline for check results.
+
+    Checks enqueue their log document and endpoint status update; a background
+    task drains the bounded queue and flushes with `insert_many` and an
+    unordered `bulk_write` whenever the batch is full or the flush interval
+    elapses. Each flushed batch is also folded into the stats rollups. A
+    full queue blocks producers (backpressure) instead of growing memory
+    without bound. Log inserts and status updates fail independently and are
+    retried on connection errors; rollups only cover the logs that landed.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Items collected for the next flush, and those of the flush in progress
+        self._batch: List[tuple] = []
+        self._flushing: List[tuple] = []
+        registry.gauge("log_writer_queue_depth", "Items waiting to be flushed", fn=self.queue_depth)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.LOG_WRITER_MAX_QUEUE)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the background task after flushing everything still queued.
+        """
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def write_log(self, log_entry: Dict[str, Any]):
+        if not self.running:
+            await logs_collection.insert_one(log_entry)
+            await RollupService.apply([log_entry])
+            return
+        await self._queue.put(("log", log_entry))
+
+    async def update_status(self, endpoint_id: str, fields: Dict[str, Any]):
+        if not self.running:
+            await db.monitored_endpoints.update_one({"_id": ObjectId(endpoint_id)}, {"$set": fields})
+            return
+        await self._queue.put(("status", endpoint_id, fields))
+
+    def pending_logs(self, endpoint_id: str) -> List[Dict[str, Any]]:
+        """
+        An endpoint's logs that are queued or being flushed, so possibly not in Mongo yet.
+        """
+        items = self._flushing + self._batch
+        if self._queue is not None:
+            # asyncio.Queue has no public way to look at waiting items
+            items = items + list(self._queue._queue)
+        return [
+            item[1] for item in items
+            if item is not None and item[0] == "log" and item[1]["endpoint_id"] == endpoint_id
+        ]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LOG_WRITER_FLUSH_INTERVAL
+        stopping = False
+
+        while not stopping:
+            timeout = max(deadline - loop.time(), 0)
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+                if item is None:
+                    stopping = True
+                else:
+                    self._batch.append(item)
+            except asyncio.TimeoutError:
+                pass
+
+            if stopping or len(self._batch) >= settings.LOG_WRITER_BATCH_SIZE or loop.time() >= deadline:
+                if self._batch:
+                    self._flushing, self._batch = self._batch, []
+                    try:
+                        await self._flush(self._flushing)
+                    finally:
+                        self._flushing = []
+                deadline = loop.time() + settings.LOG_WRITER_FLUSH_INTERVAL
+
+    async def _flush(self, batch: List[tuple]):
+        logs = [item[1] for item in batch if item[0] == "log"]
+
+        # Only the latest status per endpoint matters within one batch
+        statuses: Dict[str, Dict[str, Any]] = {}
+        for item in batch:
+            if item[0] == "status":
+                statuses.setdefault(item[1], {}).update(item[2])
+
+        start = time.perf_counter()
+        try:
+            if logs:
+                await self._write_logs(logs)
+            if statuses:
+                await self._write_statuses(statuses)
+        finally:
+            flush_latency.observe(time.perf_counter() - start)
+
+    async def _retrying(self, write: Callable[[], Awaitable[Any]]):
+        """
+        Runs a write, retrying connection errors with exponential backoff.
+        """
+        for attempt in range(settings.LOG_WRITER_MAX_RETRIES + 1):
+            try:
+                return await write()
+            except ConnectionFailure:
+                if attempt >= settings.LOG_WRITER_MAX_RETRIES:
+                    raise
+                flush_retries.inc()
+                await asyncio.sleep(settings.LOG_WRITER_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _write_logs(self, logs: List[Dict[str, Any]]):
+        try:
+            await self._retrying(lambda: logs_collection.insert_many(logs, ordered=False))
+            written = logs
+        except BulkWriteError as e:
+            # Duplicate keys are logs an interrupted earlier attempt already inserted
+            failed = {
+                error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != 11000
+            }
+            written = [log for i, log in enumerate(logs) if i not in failed]
+            if failed:
+                flush_errors.inc()
+                print(f"Log writer failed to insert {len(failed)} of {len(logs)} logs: {e}")
+        except Exception as e:
+            flush_errors.inc()
+            print(f"Log writer failed to insert {len(logs)} logs: {e}")
+            return
+        flushed_logs.inc(len(written))
+
+        if written:
+            try:
+                # Not retried: the rollup $inc is not idempotent. The compactor
+                # rebuilds any hour whose summary count ends up off.
+                await RollupService.apply(written)
+            except Exception as e:
+                flush_errors.inc()
+                print(f"Log writer failed to roll up {len(written)} logs: {e}")
+
+    async def _write_statuses(self, statuses: Dict[str, Dict[str, Any]]):
+        updates = [UpdateOne({"_id": ObjectId(eid)}, {"$set": fields}) for eid, fields in statuses.items()]
+        try:
+            await self._retrying(lambda: db.monitored_endpoints.bulk_write(updates, ordered=False))
+            flushed_updates.inc(len(statuses))
+        except Exception as e:
+            flush_errors.inc()
+            print(f"Log writer failed to write {len(statuses)} status updates: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "flush_latency_seconds": flush_latency.snapshot(),
+            "logs_written": flushed_logs.value,
+            "status_updates_written": flushed_updates.value,
+            "flush_errors": flush_errors.value,
+            "flush_retries": flush_retries.value,
+        }
+
+
+log_writer = LogWriter()
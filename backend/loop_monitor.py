@@ -0,0 +1,63 @@
+import asyncio
+from typing import Optional, Dict, Any
+
+from config import settings
+from metrics import registry
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task"
+)
+loop_blocked = registry.counter(
+    "event_loop_blocked_seconds_total", "Accumulated lag above LOOP_BLOCKED_THRESHOLD"
+)
+loop_lag_last = registry.gauge("event_loop_lag_last_seconds", "Lag of the most recent sample")
+
+
+class LoopMonitor:
+    """
+    Samples event-loop responsiveness.
+
+    A task sleeps for LOOP_MONITOR_INTERVAL and records how much later than
+    requested it actually woke up. Anything blocking the loop (sync I/O,
+    CPU-bound work) shows up here, and at the same moment as an inflated
+    probe latency or a late scheduled check.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.LOOP_MONITOR_INTERVAL
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - start - interval, 0.0)
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
+            if lag > settings.LOOP_BLOCKED_THRESHOLD:
+                loop_blocked.inc(lag)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lag_seconds": loop_lag.snapshot(),
+            "last_lag_seconds": round(loop_lag_last.value, 6),
+            "blocked_seconds": round(loop_blocked.value, 6),
+        }
+
+
+loop_monitor = LoopMonitor()
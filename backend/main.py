@@ -1,12 +1,27 @@
+import time
+import inspect
 import uvicorn
 import logging
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from routes import router
 from services import MonitoringService
+from probe import probe_client
+from resolver import dns_cache
+from compaction import log_compactor
+from log_writer import log_writer
+from cache import endpoint_cache
+from check_scheduler import check_scheduler
+from sharding import shard_manager
+from models import ensure_indexes
+from pubsub import broker
+from notifications import notification_dispatcher
+from passwords import password_hasher
+from loop_monitor import loop_monitor
+from metrics import registry
 
 # Configure logging
 logging.basicConfig(
@@ -15,14 +30,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Boot time per phase; job loading continues in the background (see MonitoringService.startup_stats)
+startup_report = {"phases_ms": {}, "ready_ms": None}
+
+async def timed_phase(name: str, step):
+    start = time.perf_counter()
+    result = step()
+    if inspect.isawaitable(result):
+        await result
+    startup_report["phases_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up API Monitor...")
-    MonitoringService.start_scheduler()
-    await MonitoringService.load_jobs_from_db()
+    boot = time.perf_counter()
+    await timed_phase("loop_monitor", loop_monitor.start)
+    await timed_phase("indexes", ensure_indexes)
+    await timed_phase("probe_client", probe_client.start)
+    await timed_phase("log_writer", log_writer.start)
+    await timed_phase("notifications", notification_dispatcher.start)
+    await timed_phase("sharding", shard_manager.start)
+    await timed_phase("scheduler", MonitoringService.start_scheduler)
+    await timed_phase("job_loader", MonitoringService.start_loading)
+    await timed_phase("endpoint_cache", endpoint_cache.start)
+    startup_report["ready_ms"] = round((time.perf_counter() - boot) * 1000, 1)
+    logger.info(f"API ready in {startup_report['ready_ms']}ms {startup_report['phases_ms']}; loading jobs in the background")
     yield
     logger.info("Shutting down API Monitor...")
+    broker.close_all()
+    await endpoint_cache.stop()
+    await MonitoringService.stop_scheduler()
+    await shard_manager.stop()
+    await log_writer.stop()
+    await notification_dispatcher.stop()
+    await probe_client.close()
+    password_hasher.close()
+    await loop_monitor.stop()
 
 app = FastAPI(title="API Monitor", lifespan=lifespan)
 
@@ -48,13 +92,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(router)
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "log_writer": log_writer.stats(),
+        "scheduler": check_scheduler.stats(),
+        "sharding": shard_manager.stats(),
+        "notifications": notification_dispatcher.stats(),
+        "startup": {**startup_report, "jobs": MonitoringService.startup_stats},
+        "event_loop": loop_monitor.stats(),
+        "password_hashing": password_hasher.stats(),
+        "dns": dns_cache.stats(),
+        "compaction": log_compactor.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus scrape target; same numbers as /health plus DB, probe and loop timings
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Latency buckets in seconds, shared by the internal timing histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def snapshot(self):
+        """
+        Current value as a JSON-friendly number or dict.
+        """
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down. If `fn` is given it is read on snapshot.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, description)
+        self.value = 0.0
+        self.fn = fn
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self):
+        return self.fn() if self.fn is not None else self.value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self.register(Counter(name, description))
+
+    def gauge(self, name: str, description: str, fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, description, fn))
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, buckets))
+
+    def metrics(self) -> List[Metric]:
+        return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, object]:
+        return {metric.name: metric.snapshot() for metric in self._metrics.values()}
+
+    def render_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                with metric._lock:
+                    counts, total, count = list(metric.counts), metric.sum, metric.count
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric.name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric.name}_bucket{{le="+Inf"}} {count}')
+                lines.append(f"{metric.name}_sum {total}")
+                lines.append(f"{metric.name}_count {count}")
+            else:
+                lines.append(f"{metric.name} {float(metric.snapshot())}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,154 @@
+"""
+Copies raw logs from the regular `monitoring_logs` collection into the
+time-series collection used when LOG_STORAGE=timeseries.
+
+Usage:
+    LOG_STORAGE=timeseries uv run migrate_logs.py [--batch-size 5000] [--drop-source]
+
+The copy walks the source in (checked_at, _id) order and records the last
+copied position in `maintenance_state` after every batch, so it can be
+interrupted and re-run. Live checks written to the target while the app
+already runs with LOG_STORAGE=timeseries do not affect where it resumes.
+Logs older than LOG_RETENTION_DAYS at the first run are skipped since they
+would expire anyway. `--drop-source` only drops the source once every
+migrated source log is confirmed present in the target.
+"""
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+from config import settings
+from models import db, LOGS_COLLECTION, TIMESERIES_LOGS, ensure_indexes
+
+SOURCE_COLLECTION = "monitoring_logs"
+STATE_ID = "log_migration"
+
+
+def after(checked_at: datetime, log_id) -> dict:
+    return {"$or": [
+        {"checked_at": {"$gt": checked_at}},
+        {"checked_at": checked_at, "_id": {"$gt": log_id}},
+    ]}
+
+
+async def copy_batch(target, batch: list, check_existing: bool) -> int:
+    if check_existing:
+        # The previous run may have inserted this batch without saving its checkpoint
+        present = await target.find(
+            {"checked_at": {"$gte": batch[0]["checked_at"], "$lte": batch[-1]["checked_at"]},
+             "_id": {"$in": [log["_id"] for log in batch]}},
+            {"_id": 1},
+        ).to_list(None)
+        present_ids = {doc["_id"] for doc in present}
+        batch = [log for log in batch if log["_id"] not in present_ids]
+    if batch:
+        await target.insert_many(batch, ordered=True)
+    return len(batch)
+
+
+async def save_checkpoint(log: dict, copied: int):
+    await db.maintenance_state.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"checked_at": log["checked_at"], "last_id": log["_id"]}, "$inc": {"copied": copied}},
+    )
+
+
+async def verify(source, target, state: dict, batch_size: int):
+    """
+    Counts the migrated source window and how many of those logs the target
+    holds, looked up by _id batch by batch within each batch's time range.
+    """
+    window = {"checked_at": {"$gte": state["since"]}}
+    if state.get("checked_at") is not None:
+        window = {"$and": [window, {"$nor": [after(state["checked_at"], state["last_id"])]}]}
+    source_count = found = 0
+    batch = []
+
+    async def count(batch):
+        return await target.count_documents({
+            "checked_at": {"$gte": batch[0]["checked_at"], "$lte": batch[-1]["checked_at"]},
+            "_id": {"$in": [log["_id"] for log in batch]},
+        })
+
+    cursor = source.find(window, {"checked_at": 1}).sort([("checked_at", 1), ("_id", 1)]).batch_size(batch_size)
+    async for log in cursor:
+        batch.append(log)
+        if len(batch) >= batch_size:
+            source_count += len(batch)
+            found += await count(batch)
+            batch = []
+    if batch:
+        source_count += len(batch)
+        found += await count(batch)
+    return source_count, found
+
+
+async def migrate(batch_size: int, drop_source: bool):
+    if not TIMESERIES_LOGS:
+        raise SystemExit("Set LOG_STORAGE=timeseries before migrating.")
+
+    await ensure_indexes()
+    source = db[SOURCE_COLLECTION]
+    target = db[LOGS_COLLECTION]
+
+    state = await db.maintenance_state.find_one_and_update(
+        {"_id": STATE_ID},
+        {"$setOnInsert": {
+            "since": datetime.utcnow() - timedelta(days=settings.LOG_RETENTION_DAYS),
+            "checked_at": None,
+            "last_id": None,
+            "copied": 0,
+        }},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    query = {"checked_at": {"$gte": state["since"]}}
+    if state["checked_at"] is not None:
+        query = after(state["checked_at"], state["last_id"])
+        print(f"Resuming after {state['checked_at'].isoformat()} ({state['copied']} logs copied so far)")
+
+    copied = 0
+    started = time.perf_counter()
+    batch = []
+    # A previous run may have died after inserting a batch (or an ordered prefix
+    # of one) but before saving its checkpoint, and the time-series collection
+    # does not enforce unique _ids. Those logs come first in our order, so check
+    # for them until a batch turns out to be entirely new.
+    check_existing = True
+    cursor = source.find(query).sort([("checked_at", 1), ("_id", 1)]).batch_size(batch_size)
+    async for log in cursor:
+        batch.append(log)
+        if len(batch) >= batch_size:
+            inserted = await copy_batch(target, batch, check_existing)
+            check_existing = check_existing and inserted < len(batch)
+            await save_checkpoint(batch[-1], inserted)
+            copied += len(batch)
+            batch = []
+            print(f"Copied {copied} logs ({copied / (time.perf_counter() - started):.0f}/s)")
+    if batch:
+        inserted = await copy_batch(target, batch, check_existing)
+        await save_checkpoint(batch[-1], inserted)
+        copied += len(batch)
+
+    print(f"Done: copied {copied} logs into {LOGS_COLLECTION} in {time.perf_counter() - started:.1f}s")
+
+    if drop_source:
+        state = await db.maintenance_state.find_one({"_id": STATE_ID})
+        source_count, found = await verify(source, target, state, batch_size)
+        if found != source_count:
+            raise SystemExit(
+                f"Not dropping {SOURCE_COLLECTION}: {source_count} logs in the migrated window, "
+                f"{found} of them in {LOGS_COLLECTION}. Re-run the migration first."
+            )
+        await source.drop()
+        print(f"Verified {found} logs; dropped {SOURCE_COLLECTION}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop-source", action="store_true", help="Drop monitoring_logs after copying")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.drop_source))
@@ -1,16 +1,144 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field, BeforeValidator, EmailStr, ConfigDict, computed_field
-from typing import Optional, Annotated, Dict, Any, List
+from pymongo import IndexModel, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import OperationFailure
+from pydantic import BaseModel, Field, BeforeValidator, EmailStr, ConfigDict, computed_field, model_validator
+from typing import Optional, Annotated, Dict, Any, List, Literal
 from datetime import datetime
 from config import settings
+from metrics import registry
+from assertions import ASSERTION_TYPES, CompiledAssertion
 
 # --- Database Connection ---
-client = AsyncIOMotorClient(settings.MONGO_URI)
+mongo_command_latency = registry.histogram(
+    "mongo_command_seconds", "Round trip of a MongoDB command as measured by the driver"
+)
+mongo_command_failures = registry.counter("mongo_command_failures_total", "MongoDB commands that failed")
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Driver-level command timings. Called on Motor's worker threads, so this
+    excludes time spent waiting for the event loop.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_latency.observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_command_latency.observe(event.duration_micros / 1e6)
+        mongo_command_failures.inc()
+
+
+# connect=False defers server discovery to the first operation instead of import time
+client = AsyncIOMotorClient(settings.MONGO_URI, connect=False, event_listeners=[CommandTimer()])
 db = client[settings.DATABASE_NAME]
 
 async def get_database():
     return db
 
+# Raw check logs live in a regular collection by default, or in a MongoDB
+# time-series collection (checked_at as timeField, endpoint_id as metaField)
+# when LOG_STORAGE=timeseries. Always go through `logs_collection`.
+TIMESERIES_LOGS = settings.LOG_STORAGE == "timeseries"
+LOGS_COLLECTION = "monitoring_logs_ts" if TIMESERIES_LOGS else "monitoring_logs"
+logs_collection = db[LOGS_COLLECTION]
+
+# --- Indexes ---
+# Declared once here and created at startup; create_indexes is a no-op for
+# indexes that already exist with the same options.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "monitored_endpoints": [
+        IndexModel([("owner_email", ASCENDING), ("created_at", ASCENDING)], name="owner_created"),
+        IndexModel([("is_active", ASCENDING)], name="is_active"),
+    ],
+    LOGS_COLLECTION: [
+        # _id breaks ties between logs with the same timestamp for keyset pagination
+        IndexModel(
+            [("endpoint_id", ASCENDING), ("checked_at", DESCENDING), ("_id", DESCENDING)],
+            name="endpoint_checked_at_id",
+        ),
+    ],
+    "monitoring_rollups": [
+        IndexModel(
+            [("endpoint_id", ASCENDING), ("granularity", ASCENDING), ("bucket_start", ASCENDING)],
+            unique=True,
+            name="endpoint_granularity_bucket",
+        ),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "worker_leases": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    # Left by endpoint deletes for workers that poll instead of watching
+    "endpoint_tombstones": [
+        IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=86400, name="deleted_at_ttl"),
+    ],
+}
+
+# Indexes made redundant by one above; dropped at startup if still present
+SUPERSEDED_INDEXES = {
+    LOGS_COLLECTION: ["endpoint_checked_at"],
+}
+
+async def ensure_timeseries_logs():
+    """
+    Creates the time-series log collection, or updates its retention in place.
+    """
+    expire_after = settings.LOG_RETENTION_DAYS * 24 * 3600
+    if LOGS_COLLECTION in await db.list_collection_names(filter={"name": LOGS_COLLECTION}):
+        await db.command("collMod", LOGS_COLLECTION, expireAfterSeconds=expire_after)
+        return
+    await db.create_collection(
+        LOGS_COLLECTION,
+        timeseries={"timeField": "checked_at", "metaField": "endpoint_id", "granularity": "seconds"},
+        expireAfterSeconds=expire_after,
+    )
+
+async def ensure_log_ttl_index():
+    """
+    Replaces the old daily delete_many: Mongo's TTL monitor removes raw logs
+    older than LOG_RETENTION_DAYS in small background batches.
+    """
+    expire_after = settings.LOG_RETENTION_DAYS * 24 * 3600
+    if TIMESERIES_LOGS:
+        # Time-series collections expire buckets via a collection option instead
+        await ensure_timeseries_logs()
+        return
+    try:
+        await db.monitoring_logs.create_index(
+            [("checked_at", ASCENDING)], expireAfterSeconds=expire_after, name="checked_at_ttl"
+        )
+    except OperationFailure:
+        # Retention changed since the index was created; update it in place
+        await db.command(
+            "collMod", "monitoring_logs",
+            index={"name": "checked_at_ttl", "expireAfterSeconds": expire_after},
+        )
+
+async def ensure_indexes():
+    await ensure_log_ttl_index()
+    failed = set()
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate emails left over from before the unique index
+            failed.add(collection)
+            print(f"Failed to create indexes on {collection}: {e}")
+    for collection, names in SUPERSEDED_INDEXES.items():
+        if collection in failed:
+            continue
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+
 # --- Models / Schemas ---
 # Helper for handling MongoDB ObjectId
 PyObjectId = Annotated[str, BeforeValidator(str)]
@@ -28,17 +156,46 @@ class TokenData(BaseModel):
     email: Optional[str] = None
 
 # Endpoints
+class Assertion(BaseModel):
+    """
+    A check on the probe response: `contains`/`regex` on the body, `json_path`
+    (equals `value`, or exists when no value), `header` (contains `value`, or
+    exists) or `max_latency_ms`.
+    """
+    type: Literal[ASSERTION_TYPES]
+    value: Optional[Any] = None
+    path: Optional[str] = None  # json_path, e.g. $.status or $.items[0].id
+    name: Optional[str] = None  # header name
+
+    @model_validator(mode="after")
+    def check_compiles(self):
+        CompiledAssertion(self.model_dump())
+        return self
+
 class EndpointBase(BaseModel):
     name: str = Field(..., min_length=1)
     url: str = Field(..., pattern="^https?://")
     method: str = "GET"
     interval: int = Field(60, ge=10)
     timeout: int = Field(5, ge=1)
+    follow_redirects: bool = True
     is_active: bool = True
     headers: Optional[Dict[str, str]] = None
     body: Optional[Dict[str, Any]] = None
     slack_webhook_url: Optional[str] = None
     alert_email: Optional[EmailStr] = None
+    # Alert when `threshold_failures` of the last `threshold_window` checks failed
+    threshold_window: int = Field(5, ge=1, le=100)
+    threshold_failures: int = Field(4, ge=1, le=100)
+    # Without body assertions a check stops reading after the response headers
+    assertions: Optional[List[Assertion]] = Field(None, max_length=20)
+    max_body_bytes: Optional[int] = Field(None, ge=1, le=10485760)
+
+    @model_validator(mode="after")
+    def check_threshold(self):
+        if self.threshold_failures > self.threshold_window:
+            raise ValueError("threshold_failures cannot exceed threshold_window")
+        return self
     
 class EndpointCreate(EndpointBase):
     pass
@@ -49,11 +206,22 @@ class EndpointUpdate(BaseModel):
     method: Optional[str] = None
     interval: Optional[int] = None
     timeout: Optional[int] = None
+    follow_redirects: Optional[bool] = None
     is_active: Optional[bool] = None
     headers: Optional[Dict[str, str]] = None
     body: Optional[Dict[str, Any]] = None
     slack_webhook_url: Optional[str] = None
     alert_email: Optional[EmailStr] = None
+    threshold_window: Optional[int] = Field(None, ge=1, le=100)
+    threshold_failures: Optional[int] = Field(None, ge=1, le=100)
+    assertions: Optional[List[Assertion]] = Field(None, max_length=20)
+    max_body_bytes: Optional[int] = Field(None, ge=1, le=10485760)
+
+class BulkEndpointRequest(BaseModel):
+    # Rows stay untyped here so one invalid row is reported instead of failing the request
+    create: List[Dict[str, Any]] = []
+    update: List[Dict[str, Any]] = []  # each row needs an "id"
+    delete: List[str] = []
 
 class EndpointResponse(EndpointBase):
     id: PyObjectId = Field(validation_alias="_id")
@@ -73,12 +241,21 @@ class EndpointResponse(EndpointBase):
     )
 
 # Monitoring Logs
+class ProbeTimings(BaseModel):
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    tls_ms: Optional[float] = None
+    ttfb_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    reused_connection: bool = False
+
 class MonitoringLogBase(BaseModel):
     endpoint_id: str
     status_code: Optional[int] = None
     response_time_ms: int
     success: bool
     error: Optional[str] = None
+    timings: Optional[ProbeTimings] = None
     checked_at: datetime = Field(default_factory=datetime.utcnow)
 
 class MonitoringLogResponse(MonitoringLogBase):
@@ -0,0 +1,463 @@
+import time
+import html
+import random
+import smtplib
+import asyncio
+import httpx
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+from config import settings
+from metrics import registry
+
+DASHBOARD_URL = "http://localhost:5173"
+
+# Longest list of endpoints rendered into one digest message
+DIGEST_MAX_LINES = 50
+
+enqueued_alerts = registry.counter("notifications_enqueued_total", "Alerts accepted by the dispatcher")
+dropped_alerts = registry.counter("notifications_dropped_total", "Alerts dropped because the queue was full")
+sent_messages = registry.counter("notifications_sent_total", "Emails and webhook messages delivered")
+digested_alerts = registry.counter(
+    "notifications_digested_total", "Alerts delivered as part of a grouped digest message"
+)
+delivery_retries = registry.counter("notifications_retries_total", "Delivery attempts that were retried")
+failed_messages = registry.counter(
+    "notifications_failed_total", "Messages abandoned after exhausting their retries"
+)
+delivery_latency = registry.histogram(
+    "notifications_delivery_seconds", "Time spent delivering one message, including retries"
+)
+
+
+class Alert:
+    """
+    One threshold transition of one endpoint.
+    """
+
+    __slots__ = ("endpoint_name", "url", "success", "status_code", "error", "checked_at")
+
+    def __init__(
+        self,
+        endpoint_name: str,
+        url: str,
+        success: bool,
+        status_code: Optional[int],
+        error: Optional[str],
+        checked_at: Optional[datetime] = None,
+    ):
+        self.endpoint_name = endpoint_name
+        self.url = url
+        self.success = success
+        self.status_code = status_code
+        self.error = error
+        self.checked_at = checked_at or datetime.utcnow()
+
+
+# --- Message rendering ---
+
+def _email_shell(status_color: str, heading: str, content: str) -> str:
+    return f"""
+    <html>
+    <body style="font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f4f7fa; margin: 0; padding: 40px;">
+        <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 16px; overflow: hidden; shadow: 0 4px 6px rgba(0,0,0,0.1); border: 1px solid #e5e7eb;">
+            <div style="background-color: {status_color}; padding: 30px; text-align: center;">
+                <h1 style="color: #ffffff; margin: 0; font-size: 24px; text-transform: uppercase; letter-spacing: 2px;">{heading}</h1>
+            </div>
+            <div style="padding: 40px;">
+                <p style="font-size: 16px; color: #4b5563; margin-top: 0;">Hello,</p>
+                {content}
+                <div style="text-align: center; margin-top: 40px;">
+                    <a href="{DASHBOARD_URL}" style="background-color: #4f46e5; color: #ffffff; padding: 14px 30px; border-radius: 10px; text-decoration: none; font-weight: bold; font-size: 16px; display: inline-block;">View Dashboard</a>
+                </div>
+            </div>
+            <div style="background-color: #f9fafb; padding: 20px; text-align: center; border-top: 1px solid #e5e7eb;">
+                <p style="font-size: 12px; color: #9ca3af; margin: 0;">API Monitor - Real-time Status Tracking</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+
+def render_email(alerts: List[Alert]) -> Tuple[str, str]:
+    """
+    Returns (subject, html body) for one alert or a digest of several.
+    """
+    if len(alerts) == 1:
+        alert = alerts[0]
+        status_text = "RECOVERED" if alert.success else "CRITICAL"
+        status_color = "#10b981" if alert.success else "#ef4444"
+        name = html.escape(alert.endpoint_name)
+        url = html.escape(alert.url)
+        error_block = (
+            f'<div style="margin-top: 15px; border-top: 1px solid #e5e7eb; padding-top: 15px;"><span style="font-size: 12px; color: #ef4444; text-transform: uppercase; font-weight: bold; display: block;">Error Detail</span><span style="font-size: 14px; color: #ef4444; font-family: monospace;">{html.escape(alert.error)}</span></div>'
+            if alert.error else ''
+        )
+        content = f"""
+                <p style="font-size: 16px; color: #4b5563;">The status of your monitored endpoint <strong>{name}</strong> has changed to <span style="color: {status_color}; font-weight: bold;">{status_text}</span>.</p>
+
+                <div style="background-color: #f9fafb; border-radius: 12px; padding: 25px; margin: 30px 0; border: 1px solid #f3f4f6;">
+                    <div style="margin-bottom: 15px;">
+                        <span style="font-size: 12px; color: #9ca3af; text-transform: uppercase; font-weight: bold; display: block;">Target URL</span>
+                        <a href="{url}" style="font-size: 15px; color: #4f46e5; text-decoration: none; word-break: break-all;">{url}</a>
+                    </div>
+                    <div style="grid-template-cols: 1fr 1fr; display: grid; gap: 20px;">
+                        <div>
+                            <span style="font-size: 12px; color: #9ca3af; text-transform: uppercase; font-weight: bold; display: block;">Status Code</span>
+                            <span style="font-size: 15px; color: #1f2937; font-weight: bold;">{alert.status_code if alert.status_code else 'N/A'}</span>
+                        </div>
+                        <div>
+                            <span style="font-size: 12px; color: #9ca3af; text-transform: uppercase; font-weight: bold; display: block;">Check Time</span>
+                            <span style="font-size: 15px; color: #1f2937;">{alert.checked_at.strftime('%H:%M:%S')} UTC</span>
+                        </div>
+                    </div>
+                    {error_block}
+                </div>
+        """
+        subject = f"[{status_text}] API Status Alert: {alert.endpoint_name}"
+        return subject, _email_shell(status_color, f"API {status_text}", content)
+
+    down = sum(1 for alert in alerts if not alert.success)
+    recovered = len(alerts) - down
+    status_color = "#ef4444" if down else "#10b981"
+    if down and recovered:
+        heading = "ALERT"
+        subject = f"[{heading}] {down} endpoints down, {recovered} recovered"
+    elif down:
+        heading = "CRITICAL"
+        subject = f"[{heading}] {down} endpoints down"
+    else:
+        heading = "RECOVERED"
+        subject = f"[{heading}] {recovered} endpoints recovered"
+
+    rows = []
+    for alert in alerts[:DIGEST_MAX_LINES]:
+        color = "#10b981" if alert.success else "#ef4444"
+        state = "RECOVERED" if alert.success else "DOWN"
+        detail = html.escape(alert.error or (str(alert.status_code) if alert.status_code else "N/A"))
+        rows.append(
+            f'<tr><td style="padding: 8px 0; color: {color}; font-weight: bold; font-size: 12px;">{state}</td>'
+            f'<td style="padding: 8px; font-size: 14px; color: #1f2937;"><strong>{html.escape(alert.endpoint_name)}</strong><br>'
+            f'<span style="font-size: 12px; color: #9ca3af; word-break: break-all;">{html.escape(alert.url)}</span></td>'
+            f'<td style="padding: 8px 0; font-size: 12px; color: #4b5563; font-family: monospace;">{detail}</td></tr>'
+        )
+    more = len(alerts) - DIGEST_MAX_LINES
+    if more > 0:
+        rows.append(f'<tr><td colspan="3" style="padding: 8px 0; font-size: 13px; color: #9ca3af;">...and {more} more</td></tr>')
+
+    content = f"""
+                <p style="font-size: 16px; color: #4b5563;">{len(alerts)} of your monitored endpoints changed status at about {alerts[0].checked_at.strftime('%H:%M:%S')} UTC.</p>
+                <div style="background-color: #f9fafb; border-radius: 12px; padding: 25px; margin: 30px 0; border: 1px solid #f3f4f6;">
+                    <table style="width: 100%; border-collapse: collapse;">{''.join(rows)}</table>
+                </div>
+    """
+    return subject, _email_shell(status_color, f"API {heading}", content)
+
+
+def render_slack(alerts: List[Alert]) -> Dict[str, Any]:
+    if len(alerts) == 1:
+        alert = alerts[0]
+        status_text = "UP" if alert.success else "DOWN"
+        color = "#36a64f" if alert.success else "#ff0000"
+        emoji = "✅" if alert.success else "❌"
+        return {
+            "attachments": [
+                {
+                    "color": color,
+                    "title": f"{emoji} API Status Change: {alert.endpoint_name} is {status_text}",
+                    "fields": [
+                        {"title": "URL", "value": alert.url, "short": False},
+                        {"title": "Status Code", "value": str(alert.status_code) if alert.status_code else "N/A", "short": True},
+                        {"title": "Error", "value": alert.error if alert.error else "None", "short": True}
+                    ],
+                    "ts": time.time()
+                }
+            ]
+        }
+
+    down = [alert for alert in alerts if not alert.success]
+    recovered = [alert for alert in alerts if alert.success]
+    attachments = []
+    for group, color, emoji, label in (
+        (down, "#ff0000", "❌", "DOWN"),
+        (recovered, "#36a64f", "✅", "UP"),
+    ):
+        if not group:
+            continue
+        lines = [
+            f"• *{alert.endpoint_name}* {alert.url}" + (f" ({alert.error})" if alert.error and not alert.success else "")
+            for alert in group[:DIGEST_MAX_LINES]
+        ]
+        if len(group) > DIGEST_MAX_LINES:
+            lines.append(f"...and {len(group) - DIGEST_MAX_LINES} more")
+        attachments.append({
+            "color": color,
+            "title": f"{emoji} {len(group)} endpoints are {label}",
+            "text": "\n".join(lines),
+            "ts": time.time(),
+        })
+    return {"attachments": attachments}
+
+
+# --- Transports ---
+
+class SMTPPool:
+    """
+    Small pool of authenticated SMTP connections.
+
+    smtplib is blocking, so every send runs in a worker thread. Connections are
+    kept open between sends (one STARTTLS + login per connection rather than per
+    email), closed when idle for too long, and transparently reopened when the
+    server has dropped them.
+    """
+
+    def __init__(self, size: int):
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+
+    @staticmethod
+    def _connect() -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.NOTIFY_SEND_TIMEOUT)
+        server.starttls()
+        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _send_sync(self, server: Optional[smtplib.SMTP], message: MIMEMultipart) -> smtplib.SMTP:
+        if server is not None:
+            try:
+                server.send_message(message)
+                return server
+            except smtplib.SMTPServerDisconnected:
+                # Dropped while idle; reconnect and retry once
+                server.close()
+            except Exception:
+                self._close(server)
+                raise
+        server = self._connect()
+        try:
+            server.send_message(message)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    async def send(self, message: MIMEMultipart):
+        async with self._slots:
+            server = None
+            now = time.monotonic()
+            while self._idle and server is None:
+                candidate, last_used = self._idle.pop()
+                if now - last_used > settings.NOTIFY_SMTP_IDLE_TIMEOUT:
+                    await asyncio.to_thread(self._close, candidate)
+                else:
+                    server = candidate
+            sending = asyncio.ensure_future(asyncio.to_thread(self._send_sync, server, message))
+            try:
+                server = await asyncio.shield(sending)
+            except asyncio.CancelledError:
+                # The thread keeps going; close its connection once it is done
+                sending.add_done_callback(self._discard)
+                raise
+            self._idle.append((server, time.monotonic()))
+
+    @staticmethod
+    def _discard(sending: asyncio.Future):
+        if not sending.cancelled() and sending.exception() is None:
+            sending.result().close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for server, _ in idle:
+            await asyncio.to_thread(self._close, server)
+
+
+# --- Dispatcher ---
+
+class NotificationDispatcher:
+    """
+    Delivers alert emails and Slack webhooks off the check path.
+
+    `notify` only enqueues. A background task groups alerts by destination
+    (channel + address) for NOTIFY_DIGEST_WINDOW seconds after the first one
+    arrives, then sends one message per destination: the usual single alert,
+    or a digest when a shared outage flipped many endpoints at once. Messages
+    are sent concurrently through a pooled SMTP connection set and a shared
+    HTTP client, with exponential backoff between retries.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._smtp: Optional[SMTPPool] = None
+        self._sending: Optional[asyncio.Semaphore] = None
+        self._inflight: set = set()
+        self._stopping = False
+        registry.gauge("notifications_queue_depth", "Alerts waiting to be grouped", fn=self.queue_depth)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @staticmethod
+    def email_configured() -> bool:
+        return bool(settings.SMTP_USER and settings.SMTP_PASSWORD)
+
+    async def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=settings.NOTIFY_QUEUE_SIZE)
+        self._sending = asyncio.Semaphore(settings.NOTIFY_MAX_CONCURRENCY)
+        self._smtp = SMTPPool(settings.NOTIFY_SMTP_POOL_SIZE)
+        self._http = httpx.AsyncClient(timeout=settings.NOTIFY_SEND_TIMEOUT)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Sends whatever is still grouped or queued (without further retries) and
+        closes the pooled connections.
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        await self._http.aclose()
+        await self._smtp.close()
+
+    def notify(self, endpoint: dict, success: bool, status_code: Optional[int], error: Optional[str], checked_at: Optional[datetime] = None):
+        """
+        Queues a status transition for every destination configured on the endpoint.
+        """
+        alert = Alert(endpoint.get("name", ""), endpoint.get("url", ""), success, status_code, error, checked_at)
+        destinations = []
+        if endpoint.get("slack_webhook_url"):
+            destinations.append(("slack", endpoint["slack_webhook_url"]))
+        if endpoint.get("alert_email") and self.email_configured():
+            destinations.append(("email", endpoint["alert_email"]))
+
+        for channel, target in destinations:
+            if not self.running:
+                # Outside the app lifespan (scripts); deliver directly
+                task = asyncio.create_task(self._deliver(channel, target, [alert]))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                continue
+            try:
+                self._queue.put_nowait((channel, target, alert))
+                enqueued_alerts.inc()
+            except asyncio.QueueFull:
+                dropped_alerts.inc()
+                print(f"Notification queue full; dropped {channel} alert for {alert.endpoint_name}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # (channel, target) -> (deadline, alerts), in arrival order
+        pending: Dict[Tuple[str, str], Tuple[float, List[Alert]]] = {}
+        stopping = False
+
+        while not stopping:
+            timeout = None
+            if pending:
+                timeout = max(min(deadline for deadline, _ in pending.values()) - loop.time(), 0)
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+                if item is None:
+                    stopping = True
+                else:
+                    channel, target, alert = item
+                    key = (channel, target)
+                    if key in pending:
+                        pending[key][1].append(alert)
+                    else:
+                        pending[key] = (loop.time() + settings.NOTIFY_DIGEST_WINDOW, [alert])
+            except asyncio.TimeoutError:
+                pass
+
+            now = loop.time()
+            for key in [k for k, (deadline, _) in pending.items() if stopping or deadline <= now]:
+                _, alerts = pending.pop(key)
+                task = asyncio.create_task(self._deliver(key[0], key[1], alerts))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, channel: str, target: str, alerts: List[Alert]):
+        start = time.perf_counter()
+        attempts = 1 if self._stopping else settings.NOTIFY_MAX_RETRIES + 1
+        sending = self._sending or asyncio.Semaphore(1)
+        try:
+            for attempt in range(attempts):
+                try:
+                    async with sending:
+                        if channel == "slack":
+                            await self._send_slack(target, alerts)
+                        else:
+                            await self._send_email(target, alerts)
+                    sent_messages.inc()
+                    if len(alerts) > 1:
+                        digested_alerts.inc(len(alerts))
+                    print(f"Sent {channel} notification covering {len(alerts)} alert(s)")
+                    return
+                except Exception as e:
+                    if attempt + 1 >= attempts or self._stopping:
+                        failed_messages.inc()
+                        print(f"Failed to send {channel} notification after {attempt + 1} attempt(s): {e}")
+                        return
+                    delivery_retries.inc()
+                    # Exponential backoff with jitter so a recovering server is not hit in lockstep
+                    delay = settings.NOTIFY_RETRY_BACKOFF * (2 ** attempt)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        finally:
+            delivery_latency.observe(time.perf_counter() - start)
+
+    async def _send_slack(self, webhook_url: str, alerts: List[Alert]):
+        payload = render_slack(alerts)
+        if self._http is None:
+            async with httpx.AsyncClient(timeout=settings.NOTIFY_SEND_TIMEOUT) as client:
+                response = await client.post(webhook_url, json=payload)
+        else:
+            response = await self._http.post(webhook_url, json=payload)
+        response.raise_for_status()
+
+    async def _send_email(self, to_email: str, alerts: List[Alert]):
+        subject, body = render_email(alerts)
+        message = MIMEMultipart()
+        message["From"] = settings.EMAILS_FROM
+        message["To"] = to_email
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "html"))
+        if self._smtp is None:
+            self._smtp = SMTPPool(settings.NOTIFY_SMTP_POOL_SIZE)
+        await self._smtp.send(message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "in_flight": len(self._inflight),
+            "enqueued": enqueued_alerts.value,
+            "sent": sent_messages.value,
+            "digested": digested_alerts.value,
+            "retries": delivery_retries.value,
+            "failed": failed_messages.value,
+            "dropped": dropped_alerts.value,
+        }
+
+
+notification_dispatcher = NotificationDispatcher()
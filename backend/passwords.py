@@ -0,0 +1,86 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from config import settings
+from metrics import registry
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+hash_latency = registry.histogram(
+    "password_hash_seconds", "Time a bcrypt hash or verify took in the worker pool"
+)
+hash_rejected = registry.counter(
+    "password_hash_rejected_total", "Hash/verify requests rejected because the pool queue was full"
+)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool.
+
+    bcrypt is deliberately slow (100-300ms) and releases the GIL while it
+    works, so running it on threads keeps the event loop free for checks.
+    The pool is sized separately from asyncio's default executor and the
+    number of waiting requests is capped: beyond PASSWORD_HASH_MAX_PENDING,
+    logins and registrations get a 503 instead of queueing without bound.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        registry.gauge("password_hash_pending", "Hash/verify requests queued or running", fn=lambda: self._pending)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            hash_latency.observe(time.perf_counter() - start)
+
+    async def _run(self, fn, *args):
+        if self._pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            hash_rejected.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._timed, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, password, hashed_password)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending,
+            "rejected": hash_rejected.value,
+            "latency_seconds": hash_latency.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,268 @@
+import time
+import asyncio
+import httpx
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+
+from config import settings
+from metrics import registry
+from resolver import dns_cache, CachingNetworkBackend, current_timer
+
+probe_duration = registry.histogram(
+    "probe_duration_seconds", "Wall time of a probe request, measured with perf_counter"
+)
+probe_errors = registry.counter("probe_errors_total", "Probes that ended in a timeout or transport error")
+host_slot_timeouts = registry.counter(
+    "probe_host_slot_timeouts_total", "Probes that timed out waiting for a free connection slot to their host"
+)
+
+# Browser-like headers sent with every probe unless the endpoint overrides them
+DEFAULT_PROBE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+
+
+class ProbeTimer:
+    """
+    Collects connection phase timings from httpcore's `trace` extension.
+
+    Phases are summed across redirects. On a reused keep-alive connection the
+    DNS/connect/TLS phases never fire, so they stay `None`. DNS time is
+    reported by the network backend and taken out of `connect_ms`.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.dns_ms: Optional[float] = None
+        self.connect_ms: Optional[float] = None
+        self.tls_ms: Optional[float] = None
+        self.ttfb_ms: Optional[float] = None
+        self.total_ms: Optional[float] = None
+        self._started: Dict[str, float] = {}
+        self._dns_at_connect = 0.0
+
+    def _add(self, attr: str, started: float, now: float):
+        elapsed = (now - started) * 1000
+        setattr(self, attr, (getattr(self, attr) or 0) + elapsed)
+
+    def add_dns(self, elapsed_ms: float):
+        self.dns_ms = (self.dns_ms or 0) + elapsed_ms
+
+    async def trace(self, event_name: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        phase, _, outcome = event_name.rpartition(".")
+
+        if outcome == "started":
+            self._started[phase] = now
+            if phase == "connection.connect_tcp":
+                self._dns_at_connect = self.dns_ms or 0
+            return
+
+        started = self._started.pop(phase, None)
+        if started is None:
+            return
+
+        if phase == "connection.connect_tcp":
+            # Resolution happens inside connect_tcp; count it only as DNS
+            self._add("connect_ms", started + ((self.dns_ms or 0) - self._dns_at_connect) / 1000, now)
+        elif phase == "connection.start_tls":
+            self._add("tls_ms", started, now)
+        elif phase.endswith("receive_response_headers") and outcome == "complete":
+            self.ttfb_ms = (now - self.start) * 1000
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        def _round(value):
+            return round(value, 2) if value is not None else None
+
+        return {
+            "dns_ms": _round(self.dns_ms),
+            "connect_ms": _round(self.connect_ms),
+            "tls_ms": _round(self.tls_ms),
+            "ttfb_ms": _round(self.ttfb_ms),
+            "total_ms": _round(self.total_ms),
+            "reused_connection": self.connect_ms is None and self.ttfb_ms is not None,
+        }
+
+
+class ProbeClient:
+    """
+    Long-lived, connection-pooled HTTP client shared by every endpoint check.
+
+    Created once in the application lifespan so probes reuse TCP/TLS
+    connections instead of paying a fresh handshake and DNS lookup each tick.
+    Per-endpoint timeout and redirect settings are applied per request.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight = 0
+        registry.gauge("probes_in_flight", "Probe requests currently on the wire", fn=lambda: self.in_flight)
+
+    @staticmethod
+    def _http2_available() -> bool:
+        if not settings.PROBE_HTTP2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("PROBE_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+            return False
+        return True
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.PROBE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROBE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PROBE_KEEPALIVE_EXPIRY,
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits, http2=self._http2_available())
+        if settings.DNS_CACHE_ENABLED:
+            # httpx has no public hook for the httpcore network backend
+            transport._pool._network_backend = CachingNetworkBackend(dns_cache)
+        return httpx.AsyncClient(transport=transport, headers=DEFAULT_PROBE_HEADERS)
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_slots.clear()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Lazily created so one-off scripts can probe without the app lifespan
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        """
+        Caps concurrent requests (and therefore pooled connections) per origin.
+        """
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        slot = self._host_slots.get(origin)
+        if slot is None:
+            slot = asyncio.Semaphore(settings.PROBE_MAX_CONNECTIONS_PER_HOST)
+            self._host_slots[origin] = slot
+        return slot
+
+    async def probe(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[Dict[str, Any]] = None,
+        timeout: float = 5,
+        follow_redirects: bool = True,
+        read_body: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Performs a single check and returns status, error and phase timings.
+
+        The response is streamed: the first `read_body` bytes of the body are
+        kept for assertions, and reading stops once neither they nor
+        PROBE_DRAIN_BYTES need more, so a large download is cut off instead of
+        buffered. Reads are timed as part of `total_ms`.
+        """
+        timer = ProbeTimer()
+        status_code = None
+        success = False
+        error = None
+        headers_out: Dict[str, str] = {}
+        body_out: Optional[bytes] = None
+        encoding = None
+        truncated = False
+
+        slot = self._host_slot(url)
+        try:
+            try:
+                # The check already holds a scheduler slot and timeout budget, so
+                # a busy origin must not keep it waiting past its own timeout
+                await asyncio.wait_for(slot.acquire(), timeout)
+            except asyncio.TimeoutError:
+                host_slot_timeouts.inc()
+                raise httpx.PoolTimeout(f"No free connection slot for this host within {timeout}s")
+            try:
+                # Time spent waiting for a host slot is not network latency
+                timer.start = time.perf_counter()
+                self.in_flight += 1
+                timer_token = current_timer.set(timer)
+                try:
+                    request = self.client.build_request(
+                        method,
+                        url,
+                        headers=headers,
+                        json=body,
+                        timeout=timeout,
+                        extensions={"trace": timer.trace},
+                    )
+                    response = await self.client.send(request, follow_redirects=follow_redirects, stream=True)
+                    try:
+                        status_code = response.status_code
+                        headers_out = {k.lower(): v for k, v in response.headers.items()}
+                        encoding = response.charset_encoding
+                        body_out, truncated = await self._read_body(response, read_body)
+                    finally:
+                        # Closing before the end discards the connection rather than pooling it
+                        await response.aclose()
+                finally:
+                    self.in_flight -= 1
+                    current_timer.reset(timer_token)
+                success = 200 <= status_code < 300
+            finally:
+                slot.release()
+        except httpx.TimeoutException:
+            error = "Timeout"
+        except httpx.RequestError as e:
+            error = str(e)
+        except Exception as e:
+            error = str(e)
+
+        timer.finish()
+        probe_duration.observe(timer.total_ms / 1000)
+        if error is not None:
+            probe_errors.inc()
+
+        return {
+            "status_code": status_code,
+            "success": success,
+            "error": error,
+            "timings": timer.as_dict(),
+            "headers": headers_out,
+            "body": body_out if read_body else None,
+            "encoding": encoding,
+            "body_truncated": truncated,
+        }
+
+    @staticmethod
+    async def _read_body(response: httpx.Response, keep: int):
+        """
+        Reads at most max(keep, PROBE_DRAIN_BYTES) bytes; returns the first `keep`
+        and whether the body was longer than that.
+        """
+        limit = max(keep, settings.PROBE_DRAIN_BYTES)
+        length = response.headers.get("content-length")
+        if not keep and (length is None or not length.isdigit() or int(length) > limit):
+            # Status-only check of an unknown or large body: stop after the headers
+            return None, False
+
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            if received < keep:
+                chunks.append(chunk[:keep - received])
+            received += len(chunk)
+            if received > limit:
+                break
+        return b"".join(chunks), keep > 0 and received > keep
+
+
+probe_client = ProbeClient()
@@ -0,0 +1,95 @@
+import json
+import asyncio
+from typing import Dict, Set, Optional, Any
+
+from fastapi.encoders import jsonable_encoder
+
+from config import settings
+from metrics import registry
+
+published_events = registry.counter("stream_events_published_total", "Events published to live subscribers")
+dropped_subscribers = registry.counter(
+    "stream_subscribers_dropped_total", "Subscribers disconnected for falling behind"
+)
+
+
+class Subscription:
+    """
+    One connected client. Events are pre-encoded SSE frames in a bounded queue.
+    """
+
+    __slots__ = ("owner_email", "queue", "closed")
+
+    def __init__(self, owner_email: str, maxsize: int):
+        self.owner_email = owner_email
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = asyncio.Event()
+
+    async def next_frame(self, timeout: float) -> Optional[str]:
+        """
+        Waits for the next frame; returns None on timeout or once dropped.
+        """
+        if self.closed.is_set():
+            return None
+        get = asyncio.ensure_future(self.queue.get())
+        closed = asyncio.ensure_future(self.closed.wait())
+        done, pending = await asyncio.wait({get, closed}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if get in done:
+            return get.result()
+        return None
+
+
+class Broker:
+    """
+    In-process fan-out of check results to live dashboard connections.
+
+    Subscribers are indexed by owner email, so publishing a check touches only
+    that user's connections and encodes the event once. A subscriber whose
+    buffer is full is dropped rather than allowed to slow down the check path;
+    the browser's EventSource reconnects on its own.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        registry.gauge("stream_subscribers", "Connected live stream subscribers", fn=self.subscriber_count)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, owner_email: str) -> Subscription:
+        subscription = Subscription(owner_email, settings.STREAM_SUBSCRIBER_BUFFER)
+        self._subscribers.setdefault(owner_email, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subs = self._subscribers.get(subscription.owner_email)
+        if subs is None:
+            return
+        subs.discard(subscription)
+        if not subs:
+            del self._subscribers[subscription.owner_email]
+
+    def publish(self, owner_email: Optional[str], event: str, data: Dict[str, Any]):
+        subs = self._subscribers.get(owner_email)
+        if not subs:
+            return
+        frame = f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+        for subscription in list(subs):
+            try:
+                subscription.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                dropped_subscribers.inc()
+                subscription.closed.set()
+                self.unsubscribe(subscription)
+        published_events.inc()
+
+    def close_all(self):
+        for subs in list(self._subscribers.values()):
+            for subscription in list(subs):
+                subscription.closed.set()
+        self._subscribers.clear()
+
+
+broker = Broker()
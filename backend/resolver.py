@@ -0,0 +1,179 @@
+import time
+import socket
+import asyncio
+import ipaddress
+import contextvars
+from typing import Optional, Dict, List, Any
+
+import httpcore
+from httpcore import AsyncNetworkBackend, AsyncNetworkStream, AnyIOBackend
+
+from config import settings
+from metrics import registry
+from cache import TTLCache
+
+dns_lookups = registry.counter("dns_lookups_total", "Hostname resolutions that went to the resolver")
+dns_cache_hits = registry.counter("dns_cache_hits_total", "Hostname resolutions answered from the DNS cache")
+dns_failures = registry.counter("dns_failures_total", "Hostname resolutions that failed (negatively cached)")
+dns_seconds = registry.histogram("dns_resolve_seconds", "Time spent resolving a hostname, cache hits included")
+
+# Set by the probe around each request so the backend can report DNS time to its timer
+current_timer: contextvars.ContextVar = contextvars.ContextVar("probe_timer", default=None)
+
+
+class ResolutionError(OSError):
+    pass
+
+
+class DNSCache:
+    """
+    Shared async hostname cache for the probe client.
+
+    Answers are kept for their record TTL (clamped to DNS_CACHE_MAX_TTL) when
+    the optional `dnspython` package is installed, otherwise for
+    DNS_CACHE_TTL. Failed lookups are cached for DNS_NEGATIVE_TTL so a dead
+    hostname is not re-resolved by every endpoint on it each tick, and
+    concurrent lookups of the same name share one query.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(settings.DNS_CACHE_SIZE, settings.DNS_CACHE_TTL)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._resolver = self._dnspython_resolver()
+        registry.gauge("dns_cache_entries", "Hostnames in the DNS cache", fn=lambda: len(self._cache))
+
+    @staticmethod
+    def _dnspython_resolver():
+        try:
+            import dns.asyncresolver
+        except ImportError:
+            return None
+        return dns.asyncresolver.Resolver()
+
+    async def resolve(self, host: str) -> List[str]:
+        cached = self._cache.get(host)
+        if cached is not None:
+            dns_cache_hits.inc()
+            if isinstance(cached, str):
+                # Negative entry; a fresh exception each time so tracebacks do not pile up
+                raise ResolutionError(cached)
+            return cached
+
+        pending = self._pending.get(host)
+        if pending is None:
+            pending = asyncio.ensure_future(self._lookup(host))
+            self._pending[host] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(host, None))
+        else:
+            dns_cache_hits.inc()
+        # Shielded so one caller timing out does not cancel the lookup for the others
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host: str) -> List[str]:
+        dns_lookups.inc()
+        try:
+            addresses, ttl = await self._query(host)
+        except OSError as e:
+            dns_failures.inc()
+            reason = f"DNS resolution failed for {host}: {e}"
+            self._cache.set(host, reason, settings.DNS_NEGATIVE_TTL)
+            raise ResolutionError(reason)
+        self._cache.set(host, addresses, ttl)
+        return addresses
+
+    async def _query(self, host: str):
+        if self._resolver is not None:
+            import dns.exception
+            try:
+                answer = await self._resolver.resolve(host, "A", search=True)
+                ttl = min(max(answer.rrset.ttl, 1), settings.DNS_CACHE_MAX_TTL)
+                return [record.address for record in answer], ttl
+            except dns.exception.DNSException:
+                pass  # AAAA-only names and /etc/hosts entries go through the system resolver
+
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise ResolutionError("no addresses")
+        return addresses, settings.DNS_CACHE_TTL
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._cache),
+            "lookups": int(dns_lookups.value),
+            "hits": int(dns_cache_hits.value),
+            "failures": int(dns_failures.value),
+            "ttl_source": "record" if self._resolver is not None else "fixed",
+        }
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class CachingNetworkBackend(AsyncNetworkBackend):
+    """
+    httpcore network backend that resolves through the DNS cache and connects
+    to the resolved addresses in turn. TLS still uses the original hostname
+    for SNI and certificate checks, and the pool still keys connections by
+    origin, so endpoints on the same host share both.
+    """
+
+    def __init__(self, dns_cache: DNSCache):
+        self._dns = dns_cache
+        self._backend = AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options=None,
+    ) -> AsyncNetworkStream:
+        if is_ip_address(host):
+            return await self._backend.connect_tcp(
+                host, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+            )
+
+        started = time.perf_counter()
+        try:
+            addresses = await asyncio.wait_for(self._dns.resolve(host), timeout)
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"DNS resolution timed out for {host}")
+        except ResolutionError as e:
+            raise httpcore.ConnectError(str(e))
+        finally:
+            elapsed = time.perf_counter() - started
+            dns_seconds.observe(elapsed)
+            timer = current_timer.get()
+            if timer is not None:
+                timer.add_dns(elapsed * 1000)
+
+        if timeout is not None:
+            timeout = max(timeout - (time.perf_counter() - started), 0.001)
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except httpcore.ConnectError as e:
+                last_error = e
+        raise last_error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None) -> AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+dns_cache = DNSCache()
@@ -0,0 +1,288 @@
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Tuple, Optional
+from pymongo import UpdateOne, ASCENDING
+
+from config import settings
+from models import db
+from sketch import DDSketch
+
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# How long each rollup tier is kept (via the expires_at TTL index)
+ROLLUP_RETENTION = {
+    "minute": timedelta(days=2),
+    "hour": timedelta(days=settings.ROLLUP_HOUR_RETENTION_DAYS),
+    "day": timedelta(days=settings.ROLLUP_DAY_RETENTION_DAYS),
+}
+
+# Range accepted by get_stats -> (lookback, rollup granularity read)
+STATS_RANGES = {
+    "1h": (timedelta(hours=1), "minute"),
+    "24h": (timedelta(hours=24), "hour"),
+    "7d": (timedelta(days=7), "hour"),
+    "30d": (timedelta(days=30), "hour"),
+    "90d": (timedelta(days=90), "day"),
+}
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open ended
+LATENCY_BUCKETS_MS = (25, 50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000)
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def latency_bucket(latency_ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if latency_ms <= bound:
+            return f"le_{bound}"
+    return "inf"
+
+
+def error_class(log: Dict[str, Any]) -> str:
+    """
+    Coarse failure category stored in rollups, so long-range stats can tell
+    timeouts and DNS trouble apart from HTTP errors once raw logs are gone.
+    """
+    error = log.get("error") or ""
+    if error.startswith("Assertion failed"):
+        return "assertion"
+    if error == "Timeout":
+        return "timeout"
+    if error.startswith("DNS"):
+        return "dns"
+    if "SSL" in error or "certificate" in error:
+        return "tls"
+    if error:
+        return "connection"
+    status_code = log.get("status_code") or 0
+    if status_code >= 500:
+        return "http_5xx"
+    if status_code >= 400:
+        return "http_4xx"
+    return "http_other"
+
+
+class RollupAccumulator:
+    """
+    Folds log documents into per (endpoint, tier, bucket) aggregates.
+
+    Latency aggregates (including the quantile sketch) only count successful
+    checks; failures are stored with 0ms and would otherwise drag them down.
+    """
+
+    def __init__(self, granularities: Iterable[str] = tuple(GRANULARITIES)):
+        self.granularities = tuple(granularities)
+        self.buckets: Dict[Tuple[str, str, datetime], Dict[str, Any]] = {}
+
+    def add(self, log: Dict[str, Any]):
+        for granularity in self.granularities:
+            key = (log["endpoint_id"], granularity, bucket_start(log["checked_at"], granularity))
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = {
+                    "count": 0, "successes": 0, "latency_count": 0, "latency_sum": 0,
+                    "latency_min": None, "latency_max": None, "hist": {}, "errors": {},
+                    "sketch": DDSketch(),
+                }
+            bucket["count"] += 1
+            if not log["success"]:
+                name = error_class(log)
+                bucket["errors"][name] = bucket["errors"].get(name, 0) + 1
+            else:
+                latency = log["response_time_ms"]
+                bucket["successes"] += 1
+                bucket["latency_count"] += 1
+                bucket["latency_sum"] += latency
+                if bucket["latency_min"] is None or latency < bucket["latency_min"]:
+                    bucket["latency_min"] = latency
+                if bucket["latency_max"] is None or latency > bucket["latency_max"]:
+                    bucket["latency_max"] = latency
+                name = latency_bucket(latency)
+                bucket["hist"][name] = bucket["hist"].get(name, 0) + 1
+                bucket["sketch"].add(latency)
+
+    def updates(self) -> List[UpdateOne]:
+        """
+        One upsert per bucket, incrementing so concurrent writers merge.
+        """
+        updates = []
+        for (endpoint_id, granularity, start), bucket in self.buckets.items():
+            inc = {
+                "count": bucket["count"],
+                "successes": bucket["successes"],
+                "latency_count": bucket["latency_count"],
+                "latency_sum": bucket["latency_sum"],
+            }
+            for name, count in bucket["hist"].items():
+                inc[f"hist.{name}"] = count
+            for name, count in bucket["errors"].items():
+                inc[f"errors.{name}"] = count
+            sketch = bucket["sketch"]
+            if sketch.zero_count:
+                inc["sketch.z"] = sketch.zero_count
+            for key, count in sketch.bins.items():
+                inc[f"sketch.b.{key}"] = count
+
+            update = {
+                "$inc": inc,
+                "$setOnInsert": {
+                    "expires_at": start + GRANULARITIES[granularity] + ROLLUP_RETENTION[granularity],
+                },
+            }
+            if bucket["latency_count"]:
+                update["$min"] = {"latency_min": bucket["latency_min"]}
+                update["$max"] = {"latency_max": bucket["latency_max"]}
+
+            updates.append(UpdateOne(
+                {"endpoint_id": endpoint_id, "granularity": granularity, "bucket_start": start},
+                update,
+                upsert=True,
+            ))
+        return updates
+
+    def replacements(self) -> List[UpdateOne]:
+        """
+        One upsert per bucket that overwrites it; only for buckets every log
+        of which was added.
+        """
+        return [
+            rollup_replacement(endpoint_id, granularity, start, bucket)
+            for (endpoint_id, granularity, start), bucket in self.buckets.items()
+        ]
+
+
+def rollup_replacement(endpoint_id: str, granularity: str, start: datetime, bucket: Dict[str, Any]) -> UpdateOne:
+    """
+    Upsert that overwrites a bucket with `bucket`, for rebuilding it from all
+    of its source data rather than adding to it.
+    """
+    return UpdateOne(
+        {"endpoint_id": endpoint_id, "granularity": granularity, "bucket_start": start},
+        {"$set": {
+            "count": bucket["count"],
+            "successes": bucket["successes"],
+            "latency_count": bucket["latency_count"],
+            "latency_sum": bucket["latency_sum"],
+            "latency_min": bucket["latency_min"],
+            "latency_max": bucket["latency_max"],
+            "hist": bucket["hist"],
+            "errors": bucket["errors"],
+            "sketch": bucket["sketch"].to_dict(),
+            "expires_at": start + GRANULARITIES[granularity] + ROLLUP_RETENTION[granularity],
+        }},
+        upsert=True,
+    )
+
+
+def rollup_updates(logs: Iterable[Dict[str, Any]]) -> List[UpdateOne]:
+    """
+    Folds a batch of log documents into one upsert per (endpoint, tier, bucket).
+    """
+    acc = RollupAccumulator()
+    for log in logs:
+        acc.add(log)
+    return acc.updates()
+
+
+def merge_rollups(docs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    total = successes = latency_count = 0
+    latency_sum = 0.0
+    latency_min = latency_max = None
+    hist: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    sketch = DDSketch()
+
+    for doc in docs:
+        total += doc.get("count", 0)
+        successes += doc.get("successes", 0)
+        latency_count += doc.get("latency_count", 0)
+        latency_sum += doc.get("latency_sum", 0)
+        if doc.get("latency_min") is not None:
+            latency_min = doc["latency_min"] if latency_min is None else min(latency_min, doc["latency_min"])
+        if doc.get("latency_max") is not None:
+            latency_max = doc["latency_max"] if latency_max is None else max(latency_max, doc["latency_max"])
+        for name, count in (doc.get("hist") or {}).items():
+            hist[name] = hist.get(name, 0) + count
+        for name, count in (doc.get("errors") or {}).items():
+            errors[name] = errors.get(name, 0) + count
+        sketch.merge(DDSketch.from_dict(doc.get("sketch")))
+
+    return {
+        "total": total,
+        "successes": successes,
+        "latency_count": latency_count,
+        "latency_sum": latency_sum,
+        "latency_min": latency_min,
+        "latency_max": latency_max,
+        "hist": hist,
+        "errors": errors,
+        "sketch": sketch,
+    }
+
+
+class RollupService:
+    @staticmethod
+    async def apply(logs: List[Dict[str, Any]]):
+        updates = rollup_updates(logs)
+        if updates:
+            await db.monitoring_rollups.bulk_write(updates, ordered=False)
+
+    @staticmethod
+    async def read(endpoint_id: str, granularity: str, since: datetime, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        bucket_range = {"$gte": bucket_start(since, granularity)}
+        if until is not None:
+            bucket_range["$lt"] = until
+        return await db.monitoring_rollups.find({
+            "endpoint_id": endpoint_id,
+            "granularity": granularity,
+            "bucket_start": bucket_range,
+        }).sort("bucket_start", ASCENDING).to_list(None)
+
+    @staticmethod
+    async def read_many(endpoint_ids: List[str], granularity: str, since: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Reads rollups for many endpoints in one query, grouped by endpoint id.
+        """
+        grouped: Dict[str, List[Dict[str, Any]]] = {endpoint_id: [] for endpoint_id in endpoint_ids}
+        if not endpoint_ids:
+            return grouped
+        cursor = db.monitoring_rollups.find({
+            "endpoint_id": {"$in": endpoint_ids},
+            "granularity": granularity,
+            "bucket_start": {"$gte": bucket_start(since, granularity)},
+        }).sort("bucket_start", ASCENDING)
+        async for doc in cursor:
+            grouped.setdefault(doc["endpoint_id"], []).append(doc)
+        return grouped
+
+    @staticmethod
+    async def summarize(endpoint_id: str, range_key: str) -> Dict[str, Any]:
+        lookback, granularity = STATS_RANGES[range_key]
+        docs = await RollupService.read(endpoint_id, granularity, datetime.utcnow() - lookback)
+        return merge_rollups(docs)
+
+    @staticmethod
+    async def summarize_window(endpoint_id: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        """
+        Summarizes an arbitrary window using the finest tier that still covers it
+        without reading more than a few hundred documents.
+        """
+        span = end - start
+        age = datetime.utcnow() - start
+        if span <= timedelta(hours=6) and age < ROLLUP_RETENTION["minute"]:
+            granularity = "minute"
+        elif span <= timedelta(days=14) and age < ROLLUP_RETENTION["hour"]:
+            granularity = "hour"
+        else:
+            granularity = "day"
+        docs = await RollupService.read(endpoint_id, granularity, start, end)
+        return merge_rollups(docs)
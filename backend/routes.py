@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 import handlers
+from series import DEFAULT_SERIES_POINTS, MAX_SERIES_POINTS
 from models import (
     UserCreate, Token, EndpointResponse, 
-    EndpointUpdate, MonitoringLogResponse, EndpointCreate
+    EndpointUpdate, MonitoringLogResponse, EndpointCreate, BulkEndpointRequest
 )
 
 router = APIRouter()
@@ -18,6 +21,10 @@ async def get_user(token: str = Depends(oauth2_scheme)):
         return "test@example.com" # Dev bypass
     return await handlers.get_current_user_email(token)
 
+# EventSource cannot send headers, so the live stream also accepts ?token=
+async def get_stream_user(token: Optional[str] = Depends(oauth2_scheme), query_token: Optional[str] = Query(None, alias="token")):
+    return await get_user(token or query_token)
+
 # --- Auth Routes ---
 @router.post("/auth/register", status_code=201, tags=["Auth"])
 async def register(user: UserCreate):
@@ -32,6 +39,14 @@ async def login(user_data: UserCreate):
 async def create_endpoint(endpoint: EndpointCreate, user_email: str = Depends(get_user)):
     return await handlers.create_endpoint(endpoint, user_email)
 
+@router.post("/endpoints/bulk", tags=["Endpoints"])
+async def bulk_endpoints(request: BulkEndpointRequest, user_email: str = Depends(get_user)):
+    return await handlers.bulk_endpoints(request, user_email)
+
+@router.post("/endpoints/import", tags=["Endpoints"])
+async def import_endpoints(file: UploadFile = File(..., description="CSV or JSON array of endpoints"), user_email: str = Depends(get_user)):
+    return await handlers.import_endpoints(await file.read(), file.filename or "", user_email)
+
 @router.get("/endpoints/", response_model=List[EndpointResponse], tags=["Endpoints"])
 async def list_endpoints(user_email: str = Depends(get_user)):
     return await handlers.list_endpoints(user_email)
@@ -48,11 +63,91 @@ async def update_endpoint(id: str, endpoint_update: EndpointUpdate, user_email:
 async def delete_endpoint(id: str, user_email: str = Depends(get_user)):
     return await handlers.delete_endpoint(id, user_email)
 
+# --- Dashboard Routes ---
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    Weak comparison of an ETag against an If-None-Match header, as GET requires.
+    """
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+@router.get("/dashboard", tags=["Dashboard"])
+async def get_dashboard(request: Request, user_email: str = Depends(get_user)):
+    etag, payload = await handlers.get_dashboard(user_email)
+    # no-cache lets browsers revalidate with If-None-Match on every poll
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+# --- Live Stream Routes ---
+@router.get("/stream", tags=["Dashboard"])
+async def stream(user_email: str = Depends(get_stream_user)):
+    return StreamingResponse(
+        handlers.stream_events(user_email),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- Stats Routes (Now Authenticated) ---
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 @router.get("/logs/{endpoint_id}", response_model=List[MonitoringLogResponse], tags=["Stats"])
-async def get_logs(endpoint_id: str, limit: int = 50, user_email: str = Depends(get_user)):
-    return await handlers.get_logs(endpoint_id, user_email, limit)
+async def get_logs(
+    endpoint_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    start: Optional[datetime] = Query(None, alias="from", description="Only logs checked at or after this time (UTC)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only logs checked before this time (UTC)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    user_email: str = Depends(get_user),
+):
+    logs, next_cursor = await handlers.get_logs(endpoint_id, user_email, limit, start, end, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
+
+@router.get("/logs/{endpoint_id}/export", tags=["Stats"])
+async def export_logs(
+    endpoint_id: str,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = Query(None, alias="from", description="Only logs checked at or after this time (UTC)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only logs checked before this time (UTC)"),
+    user_email: str = Depends(get_user),
+):
+    chunks = await handlers.export_logs(endpoint_id, user_email, fmt, start, end)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="logs-{endpoint_id}.{fmt}"'},
+    )
 
 @router.get("/stats/{endpoint_id}", tags=["Stats"])
-async def get_stats(endpoint_id: str, user_email: str = Depends(get_user)):
-    return await handlers.get_stats(endpoint_id, user_email)
+async def get_stats(
+    endpoint_id: str,
+    range_key: str = Query("7d", alias="range", description="Time window: 1h, 24h, 7d, 30d or 90d"),
+    start: Optional[datetime] = Query(None, description="Custom window start (UTC); overrides range"),
+    end: Optional[datetime] = Query(None, description="Custom window end (UTC), defaults to now"),
+    user_email: str = Depends(get_user),
+):
+    return await handlers.get_stats(endpoint_id, user_email, range_key, start, end)
+
+@router.get("/series/{endpoint_id}", tags=["Stats"])
+async def get_series(
+    endpoint_id: str,
+    range_key: str = Query("24h", alias="range", description="Time window: 1h, 24h, 7d, 30d or 90d"),
+    start: Optional[datetime] = Query(None, alias="from", description="Custom window start (UTC); overrides range"),
+    end: Optional[datetime] = Query(None, alias="to", description="Custom window end (UTC), defaults to now"),
+    points: int = Query(DEFAULT_SERIES_POINTS, ge=10, le=MAX_SERIES_POINTS, description="Target number of points"),
+    mode: str = Query("buckets", description="buckets (min/avg/max/p95 per bucket) or lttb (downsampled checks)"),
+    user_email: str = Depends(get_user),
+):
+    return await handlers.get_series(endpoint_id, user_email, range_key, start, end, points, mode)
@@ -0,0 +1,234 @@
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from models import logs_collection
+from rollups import RollupService, GRANULARITIES, ROLLUP_RETENTION, merge_rollups, bucket_start
+from sketch import percentiles
+
+SERIES_MODES = ("buckets", "lttb")
+DEFAULT_SERIES_POINTS = 300
+MAX_SERIES_POINTS = 2000
+
+# Stored timestamps are naive UTC
+EPOCH = datetime(1970, 1, 1)
+
+
+class LTTBSampler:
+    """
+    Largest-Triangle-Three-Buckets downsampling of (time, value) points fed
+    one at a time in time order.
+
+    Keeps the first and last point and, from each of `threshold - 2` equal
+    time slices of [start, end), the point forming the largest triangle with
+    the point kept before it and the average of the next non-empty slice.
+    Spikes survive, which plain averaging or striding would flatten. Only two
+    slices are held at a time, so memory does not grow with the window.
+    """
+
+    def __init__(self, start: datetime, end: datetime, threshold: int):
+        self.threshold = max(threshold, 3)
+        self.slices = self.threshold - 2
+        self.origin = (start - EPOCH).total_seconds()
+        self.width = max((end - start).total_seconds() / self.slices, 1e-9)
+        self.total = 0
+        self.sampled: List[Tuple[datetime, float]] = []
+        # Every point while there are few enough to return them all
+        self._all: Optional[List[Tuple[datetime, float]]] = []
+        self._anchor: Optional[Tuple[float, float]] = None
+        self._pending: List[Tuple[float, float, Tuple[datetime, float]]] = []
+        self._current: List[Tuple[float, float, Tuple[datetime, float]]] = []
+        self._current_slice = -1
+
+    def add(self, t: datetime, value: float):
+        self.total += 1
+        point = (t, value)
+        if self._all is not None:
+            self._all.append(point)
+            if len(self._all) > self.threshold:
+                self._all = None
+
+        x = (t - EPOCH).total_seconds()
+        if self._anchor is None:
+            self.sampled.append(point)
+            self._anchor = (x, value)
+            return
+        index = min(int((x - self.origin) // self.width), self.slices - 1)
+        if index != self._current_slice and self._current:
+            if self._pending:
+                self._select(self._pending, self._average(self._current))
+            self._pending = self._current
+            self._current = []
+        self._current_slice = index
+        self._current.append((x, value, point))
+
+    def finish(self) -> List[Tuple[datetime, float]]:
+        if self._all is not None:
+            return self._all
+        last = self._current.pop()
+        if self._pending:
+            self._select(self._pending, self._average(self._current) if self._current else last[:2])
+        if self._current:
+            self._select(self._current, last[:2])
+        self.sampled.append(last[2])
+        return self.sampled
+
+    @staticmethod
+    def _average(bucket) -> Tuple[float, float]:
+        return sum(p[0] for p in bucket) / len(bucket), sum(p[1] for p in bucket) / len(bucket)
+
+    def _select(self, bucket, next_avg: Tuple[float, float]):
+        ax, ay = self._anchor
+        avg_x, avg_y = next_avg
+        best = max(bucket, key=lambda p: abs((ax - avg_x) * (p[1] - ay) - (ax - p[0]) * (avg_y - ay)))
+        self.sampled.append(best[2])
+        self._anchor = best[:2]
+
+
+class OutageTracker:
+    """
+    Collapses consecutive failed checks into runs, so failures are reported
+    as explicit spans instead of 0ms points.
+    """
+
+    def __init__(self):
+        self.runs: List[Dict[str, Any]] = []
+        self._current: Optional[Dict[str, Any]] = None
+
+    def add(self, log: Dict[str, Any]):
+        if log["success"]:
+            self._current = None
+            return
+        if self._current is None:
+            self._current = {"start": log["checked_at"], "end": log["checked_at"], "failures": 0, "error": log.get("error")}
+            self.runs.append(self._current)
+        self._current["end"] = log["checked_at"]
+        self._current["failures"] += 1
+
+
+def series_tier(bucket_seconds: int, start: datetime) -> Optional[str]:
+    """
+    Rollup tier to build buckets of this size from, or None to group raw logs.
+
+    Picks the coarsest tier that is no wider than a bucket and still retained
+    back to `start`; if only coarser tiers reach that far back, the finest of
+    them is used and buckets are widened to match.
+    """
+    if bucket_seconds < GRANULARITIES["minute"].total_seconds():
+        return None
+    age = datetime.utcnow() - start
+    covering = [g for g in ("minute", "hour", "day") if age < ROLLUP_RETENTION[g]] or ["day"]
+    fitting = [g for g in covering if GRANULARITIES[g].total_seconds() <= bucket_seconds]
+    return fitting[-1] if fitting else covering[0]
+
+
+def empty_bucket(t: datetime) -> Dict[str, Any]:
+    return {"t": t, "count": 0, "failures": 0, "min": None, "avg": None, "max": None, "p95": None}
+
+
+class SeriesService:
+    @staticmethod
+    def bucket_seconds(start: datetime, end: datetime, points: int) -> int:
+        return max(math.ceil((end - start).total_seconds() / points), 1)
+
+    @staticmethod
+    async def buckets(endpoint_id: str, start: datetime, end: datetime, points: int) -> Dict[str, Any]:
+        """
+        Fixed-width buckets with min/avg/max/p95 latency of successful checks
+        and the number of failed checks. Buckets of a minute or more are read
+        from the rollups; finer ones are grouped from raw logs by an aggregation.
+        """
+        size = SeriesService.bucket_seconds(start, end, points)
+        tier = series_tier(size, start)
+        if tier is not None:
+            # Whole rollup buckets only, so every series bucket merges the same number of them
+            tier_seconds = int(GRANULARITIES[tier].total_seconds())
+            size = math.ceil(size / tier_seconds) * tier_seconds
+            start = bucket_start(start, tier)
+            buckets = await SeriesService._from_rollups(endpoint_id, tier, start, end, size)
+        else:
+            buckets = await SeriesService._from_logs(endpoint_id, start, end, size)
+        return {"mode": "buckets", "source": tier or "raw", "bucket_seconds": size, "buckets": buckets}
+
+    @staticmethod
+    async def _from_rollups(endpoint_id: str, tier: str, start: datetime, end: datetime, size: int) -> List[Dict[str, Any]]:
+        docs = await RollupService.read(endpoint_id, tier, start, end)
+        grouped: Dict[int, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            index = max(int((doc["bucket_start"] - start).total_seconds() // size), 0)
+            grouped.setdefault(index, []).append(doc)
+
+        buckets = []
+        for index in sorted(grouped):
+            summary = merge_rollups(grouped[index])
+            bucket = empty_bucket(start + timedelta(seconds=index * size))
+            bucket["count"] = summary["total"]
+            bucket["failures"] = summary["total"] - summary["successes"]
+            if summary["latency_count"]:
+                bucket["min"] = summary["latency_min"]
+                bucket["avg"] = round(summary["latency_sum"] / summary["latency_count"], 2)
+                bucket["max"] = summary["latency_max"]
+                bucket["p95"] = percentiles(summary["sketch"])["p95"]
+            buckets.append(bucket)
+        return buckets
+
+    @staticmethod
+    async def _from_logs(endpoint_id: str, start: datetime, end: datetime, size: int) -> List[Dict[str, Any]]:
+        start_ms = int((start - EPOCH).total_seconds() * 1000)
+        latency = {"$cond": ["$success", "$response_time_ms", None]}
+        pipeline = [
+            {"$match": {"endpoint_id": endpoint_id, "checked_at": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {"$floor": {"$divide": [
+                    {"$subtract": [{"$toLong": "$checked_at"}, start_ms]}, size * 1000,
+                ]}},
+                "count": {"$sum": 1},
+                "failures": {"$sum": {"$cond": ["$success", 0, 1]}},
+                # $min/$avg/$max skip the nulls left by failed checks
+                "min": {"$min": latency},
+                "avg": {"$avg": latency},
+                "max": {"$max": latency},
+                "latencies": {"$push": latency},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+
+        buckets = []
+        async for doc in logs_collection.aggregate(pipeline):
+            bucket = empty_bucket(start + timedelta(seconds=int(doc["_id"]) * size))
+            bucket["count"] = doc["count"]
+            bucket["failures"] = doc["failures"]
+            latencies = sorted(v for v in doc["latencies"] if v is not None)
+            if latencies:
+                bucket["min"] = doc["min"]
+                bucket["avg"] = round(doc["avg"], 2)
+                bucket["max"] = doc["max"]
+                bucket["p95"] = latencies[max(math.ceil(0.95 * len(latencies)) - 1, 0)]
+            buckets.append(bucket)
+        return buckets
+
+    @staticmethod
+    async def downsample(endpoint_id: str, start: datetime, end: datetime, points: int) -> Dict[str, Any]:
+        """
+        LTTB-downsampled latency of successful checks plus failure runs, from
+        raw logs streamed off the cursor rather than loaded all at once.
+        """
+        sampler = LTTBSampler(start, end, points)
+        outages = OutageTracker()
+        cursor = logs_collection.find(
+            {"endpoint_id": endpoint_id, "checked_at": {"$gte": start, "$lt": end}},
+            {"_id": 0, "checked_at": 1, "success": 1, "response_time_ms": 1, "error": 1},
+        ).sort("checked_at", 1)
+        async for log in cursor:
+            outages.add(log)
+            if log["success"]:
+                sampler.add(log["checked_at"], log["response_time_ms"])
+
+        sampled = sampler.finish()
+        return {
+            "mode": "lttb",
+            "source": "raw",
+            "total_points": sampler.total,
+            "points": [{"t": t, "ms": ms} for t, ms in sampled],
+            "outages": outages.runs,
+        }
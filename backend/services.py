@@ -1,32 +1,48 @@
-import httpx
+import io
+import csv
 import time
-import smtplib
 import asyncio
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
+import json
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from pydantic import ValidationError
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.base import JobLookupError
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
 
 from config import settings
-from models import db, EndpointCreate, EndpointUpdate, MonitoringLogBase
+from passwords import password_hasher
+from models import db, logs_collection, EndpointCreate, EndpointUpdate, MonitoringLogBase
+from probe import probe_client
+from state import state_store, threshold_settings
+from log_writer import log_writer
+from cache import endpoint_cache, TTLCache
+from check_scheduler import check_scheduler
+from sharding import shard_manager
+from rollups import RollupService, STATS_RANGES, merge_rollups, bucket_start
+from sketch import percentiles
+from pubsub import broker
+from series import SeriesService, SERIES_MODES
+from notifications import notification_dispatcher
+from compaction import log_compactor
+from assertions import assertion_cache
 
 # --- Authentication Service ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class AuthService:
     @staticmethod
-    def verify_password(plain_password, hashed_password) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(plain_password, hashed_password) -> bool:
+        return await password_hasher.verify(plain_password, hashed_password)
 
     @staticmethod
-    def get_password_hash(password) -> str:
-        return pwd_context.hash(password)
+    async def get_password_hash(password) -> str:
+        return await password_hasher.hash(password)
 
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -50,18 +66,22 @@ class AuthService:
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        hashed_password = AuthService.get_password_hash(password)
+        hashed_password = await AuthService.get_password_hash(password)
         user_dict = {
             "email": email,
             "password": hashed_password
         }
-        await db.users.insert_one(user_dict)
+        try:
+            await db.users.insert_one(user_dict)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent registration (unique email index)
+            raise HTTPException(status_code=400, detail="Email already registered")
         return user_dict
 
     @staticmethod
     async def authenticate_user(email: str, password: str):
         user = await AuthService.get_user_by_email(email)
-        if not user or not AuthService.verify_password(password, user["password"]):
+        if not user or not await AuthService.verify_password(password, user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -76,154 +96,46 @@ class AuthService:
         return {"access_token": access_token, "token_type": "bearer"}
 
 # --- Scheduler & Monitoring Service ---
+# APScheduler is reserved for maintenance jobs; endpoint checks go through check_scheduler
 scheduler = AsyncIOScheduler()
 
-async def send_email_notification(to_email: str, endpoint_name: str, url: str, success: bool, status_code: Optional[int], error: Optional[str]):
-    """
-    Sends an email notification using SMTP.
-    """
-    if not settings.SMTP_USER or not settings.SMTP_PASSWORD or not to_email:
-        return
-
-    status_text = "RECOVERED" if success else "CRITICAL"
-    status_color = "#10b981" if success else "#ef4444"
-    subject = f"[{status_text}] API Status Alert: {endpoint_name}"
-    
-    body = f"""
-    <html>
-    <body style="font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f4f7fa; margin: 0; padding: 40px;">
-        <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 16px; overflow: hidden; shadow: 0 4px 6px rgba(0,0,0,0.1); border: 1px solid #e5e7eb;">
-            <div style="background-color: {status_color}; padding: 30px; text-align: center;">
-                <h1 style="color: #ffffff; margin: 0; font-size: 24px; text-transform: uppercase; letter-spacing: 2px;">API {status_text}</h1>
-            </div>
-            <div style="padding: 40px;">
-                <p style="font-size: 16px; color: #4b5563; margin-top: 0;">Hello,</p>
-                <p style="font-size: 16px; color: #4b5563;">The status of your monitored endpoint <strong>{endpoint_name}</strong> has changed to <span style="color: {status_color}; font-weight: bold;">{status_text}</span>.</p>
-                
-                <div style="background-color: #f9fafb; border-radius: 12px; padding: 25px; margin: 30px 0; border: 1px solid #f3f4f6;">
-                    <div style="margin-bottom: 15px;">
-                        <span style="font-size: 12px; color: #9ca3af; text-transform: uppercase; font-weight: bold; display: block;">Target URL</span>
-                        <a href="{url}" style="font-size: 15px; color: #4f46e5; text-decoration: none; word-break: break-all;">{url}</a>
-                    </div>
-                    <div style="grid-template-cols: 1fr 1fr; display: grid; gap: 20px;">
-                        <div>
-                            <span style="font-size: 12px; color: #9ca3af; text-transform: uppercase; font-weight: bold; display: block;">Status Code</span>
-                            <span style="font-size: 15px; color: #1f2937; font-weight: bold;">{status_code if status_code else 'N/A'}</span>
-                        </div>
-                        <div>
-                            <span style="font-size: 12px; color: #9ca3af; text-transform: uppercase; font-weight: bold; display: block;">Check Time</span>
-                            <span style="font-size: 15px; color: #1f2937;">{datetime.utcnow().strftime('%H:%M:%S')} UTC</span>
-                        </div>
-                    </div>
-                    {f'<div style="margin-top: 15px; border-top: 1px solid #e5e7eb; padding-top: 15px;"><span style="font-size: 12px; color: #ef4444; text-transform: uppercase; font-weight: bold; display: block;">Error Detail</span><span style="font-size: 14px; color: #ef4444; font-family: monospace;">{error}</span></div>' if error else ''}
-                </div>
-
-                <div style="text-align: center; margin-top: 40px;">
-                    <a href="http://localhost:5173" style="background-color: #4f46e5; color: #ffffff; padding: 14px 30px; border-radius: 10px; text-decoration: none; font-weight: bold; font-size: 16px; display: inline-block;">View Dashboard</a>
-                </div>
-            </div>
-            <div style="background-color: #f9fafb; padding: 20px; text-align: center; border-top: 1px solid #e5e7eb;">
-                <p style="font-size: 12px; color: #9ca3af; margin: 0;">API Monitor - Real-time Status Tracking</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-    message = MIMEMultipart()
-    message["From"] = settings.EMAILS_FROM
-    message["To"] = to_email
-    message["Subject"] = subject
-    message.attach(MIMEText(body, "html"))
-
-    def send_sync_email():
-        try:
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                server.send_message(message)
-                print(f"Successfully sent status email to {to_email} for {endpoint_name}")
-        except Exception as e:
-            print(f"Failed to send email notification: {e}")
-
-    await asyncio.to_thread(send_sync_email)
-
-async def send_slack_notification(webhook_url: str, endpoint_name: str, url: str, success: bool, status_code: Optional[int], error: Optional[str]):
-    """
-    Sends a notification to Slack via Webhook.
-    """
-    if not webhook_url:
-        return
-
-    status_text = "UP" if success else "DOWN"
-    color = "#36a64f" if success else "#ff0000"
-    emoji = "✅" if success else "❌"
-    
-    payload = {
-        "attachments": [
-            {
-                "color": color,
-                "title": f"{emoji} API Status Change: {endpoint_name} is {status_text}",
-                "fields": [
-                    {"title": "URL", "value": url, "short": False},
-                    {"title": "Status Code", "value": str(status_code) if status_code else "N/A", "short": True},
-                    {"title": "Error", "value": error if error else "None", "short": True}
-                ],
-                "ts": time.time()
-            }
-        ]
-    }
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(webhook_url, json=payload)
-            print(f"Successfully sent Slack notification for {endpoint_name}")
-    except Exception as e:
-        print(f"Failed to send Slack notification: {e}")
-
 async def perform_check(endpoint_id: str):
     """
     Background task to check an endpoint's status.
     """
     try:
-        endpoint = await db.monitored_endpoints.find_one({"_id": ObjectId(endpoint_id)})
+        endpoint = await endpoint_cache.get(str(endpoint_id))
         if not endpoint:
             return
 
         url = endpoint['url']
         method = endpoint.get('method', 'GET')
         timeout = endpoint.get('timeout', 5)
+        follow_redirects = endpoint.get('follow_redirects', True)
         headers = endpoint.get('headers', {})
         body = endpoint.get('body', None)
-        slack_webhook = endpoint.get('slack_webhook_url')
-        alert_email = endpoint.get('alert_email')
-
-        start = time.time()
-        error = None
-        status_code = None
-        success = False
-
-        # Browser-like headers
-        request_headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        }
-        if headers:
-            request_headers.update(headers)
-
-        try:
-            async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-                response = await client.request(method, url, headers=request_headers, json=body)
-                status_code = response.status_code
-                success = 200 <= response.status_code < 300
-        except httpx.TimeoutException:
-            error = "Timeout"
-        except httpx.RequestError as e:
-            error = str(e)
-        except Exception as e:
-            error = str(e)
+        assertions = assertion_cache.get(endpoint)
+        read_body = (endpoint.get('max_body_bytes') or settings.PROBE_MAX_BODY_BYTES) if assertions.needs_body else 0
+
+        result = await probe_client.probe(
+            method,
+            url,
+            headers=headers,
+            body=body,
+            timeout=timeout,
+            follow_redirects=follow_redirects,
+            read_body=read_body,
+        )
+        status_code = result["status_code"]
+        success = result["success"]
+        error = result["error"]
+        timings = result["timings"]
+        if success and assertions.rules:
+            error = assertions.evaluate(result)
+            success = error is None
 
         # Failure = 0ms response time for graph cleanliness
-        response_time = int((time.time() - start) * 1000) if success else 0
+        response_time = int(timings["total_ms"]) if success else 0
         checked_at = datetime.utcnow()
 
         # Log current result
@@ -233,112 +145,371 @@ async def perform_check(endpoint_id: str):
             "response_time_ms": response_time,
             "success": success,
             "error": error,
+            "timings": timings,
             "checked_at": checked_at
         }
-        await db.monitoring_logs.insert_one(log_entry)
+        # Warmed before this result is written so it is not counted twice
+        state = await state_store.ensure_warm(endpoint)
+        await log_writer.write_log(log_entry)
+
+        # Threshold Calculation (N failures out of the last M checks)
+        prev_threshold_down = state.is_threshold_down
+        currently_threshold_down = state.record(success)
+
+        if currently_threshold_down != prev_threshold_down:
+            # Claim the transition atomically so only one worker alerts for it,
+            # even while endpoints move between shards
+            claim = await db.monitored_endpoints.update_one(
+                {"_id": ObjectId(endpoint_id), "is_threshold_down": {"$ne": currently_threshold_down}},
+                {"$set": {"is_threshold_down": currently_threshold_down}}
+            )
+            if claim.modified_count == 0:
+                prev_threshold_down = currently_threshold_down
 
-        # Threshold Calculation (4 out of last 5)
-        last_logs = await db.monitoring_logs.find(
-            {"endpoint_id": str(endpoint_id)}
-        ).sort("checked_at", -1).limit(5).to_list(5)
-        
-        failure_count = sum(1 for log in last_logs if not log['success'])
-        currently_threshold_down = failure_count >= 4
-        prev_threshold_down = endpoint.get('is_threshold_down', False)
-
-        if currently_threshold_down and not prev_threshold_down:
-            # Transition to DOWN
-            if slack_webhook: await send_slack_notification(slack_webhook, endpoint['name'], url, False, status_code, error)
-            if alert_email: await send_email_notification(alert_email, endpoint['name'], url, False, status_code, error)
-        elif not currently_threshold_down and prev_threshold_down:
-            # Transition to UP (Recovery)
-            if slack_webhook: await send_slack_notification(slack_webhook, endpoint['name'], url, True, status_code, error)
-            if alert_email: await send_email_notification(alert_email, endpoint['name'], url, True, status_code, error)
-
-        # Update Database
-        await db.monitored_endpoints.update_one(
-            {"_id": ObjectId(endpoint_id)},
-            {"$set": {
-                "last_checked": checked_at,
-                "last_status_success": success,
-                "is_threshold_down": currently_threshold_down
-            }}
-        )
+        # Backs off endpoints that stay down and tightens the interval after a transition
+        check_scheduler.record_outcome(str(endpoint_id), currently_threshold_down)
+
+        owner_email = endpoint.get('owner_email')
+        broker.publish(owner_email, "check", {
+            "endpoint_id": str(endpoint_id),
+            "status_code": status_code,
+            "response_time_ms": response_time,
+            "success": success,
+            "error": error,
+            "checked_at": checked_at,
+            "is_threshold_down": currently_threshold_down,
+        })
+        if currently_threshold_down != prev_threshold_down:
+            # The frontend refetches /dashboard on this event; don't serve it the cached payload
+            dashboard_cache.pop(owner_email)
+            broker.publish(owner_email, "transition", {
+                "endpoint_id": str(endpoint_id),
+                "name": endpoint.get('name'),
+                "is_threshold_down": currently_threshold_down,
+                "checked_at": checked_at,
+            })
+            # Queued for the dispatcher, which groups and delivers off the check path
+            notification_dispatcher.notify(endpoint, not currently_threshold_down, status_code, error, checked_at)
+
+        # Update Database (batched by the log writer)
+        await log_writer.update_status(str(endpoint_id), {
+            "last_checked": checked_at,
+            "last_status_success": success,
+            "is_threshold_down": currently_threshold_down
+        })
 
     except Exception as e:
         print(f"Critical error in perform_check for {endpoint_id}: {e}")
 
-async def cleanup_logs():
-    """
-    Delete logs older than 7 days.
-    """
-    try:
-        retention_days = 7
-        cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
-        result = await db.monitoring_logs.delete_many({"checked_at": {"$lt": cutoff_date}})
-        print(f"Cleanup: Deleted {result.deleted_count} logs older than {retention_days} days.")
-    except Exception as e:
-        print(f"Error cleaning up logs: {e}")
+# Fields a check, its threshold state and the scheduler read from an endpoint
+ENDPOINT_CONFIG_PROJECTION = {
+    field: 1 for field in (
+        "name", "url", "method", "interval", "timeout", "follow_redirects", "is_active",
+        "headers", "body", "slack_webhook_url", "alert_email", "owner_email",
+        "threshold_window", "threshold_failures", "is_threshold_down", "updated_at",
+        "assertions", "max_body_bytes",
+    )
+}
 
 class MonitoringService:
+    # Progress of the background job load, reported on /health
+    startup_stats: Dict[str, Any] = {"state": "pending"}
+    _load_task: Optional[asyncio.Task] = None
+
     @staticmethod
     def start_scheduler():
+        if settings.COMPACTION_ENABLED:
+            scheduler.add_job(
+                log_compactor.run, "interval", seconds=settings.COMPACTION_INTERVAL,
+                id="log_compaction", replace_existing=True, max_instances=1, coalesce=True,
+            )
         if not scheduler.running:
             scheduler.start()
-        
-        # Schedule cleanup job
+        check_scheduler.start(perform_check)
+
+    @staticmethod
+    async def stop_scheduler():
+        task = MonitoringService._load_task
+        if task is not None and not task.done():
+            task.cancel()
+        await check_scheduler.stop()
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
+
+    @staticmethod
+    def start_loading():
+        """
+        Loads jobs in the background so the API can serve requests while a
+        large fleet is still being registered.
+        """
+        MonitoringService._load_task = asyncio.create_task(MonitoringService.load_jobs_from_db())
+
+    @staticmethod
+    async def load_jobs_from_db():
+        """
+        Streams active endpoints with a projection and registers them with the
+        scheduler batch by batch. Threshold state is warmed on each endpoint's
+        first check, and every job starts at its own phase within its interval.
+        """
+        stats = MonitoringService.startup_stats
+        stats.update(state="loading", endpoints=0, jobs=0, batches=0, seconds=None)
+        started = time.perf_counter()
+
+        check_scheduler.clear()
+        MonitoringService.start_scheduler()
+        endpoint_cache.clear()
+        state_store.clear()
+
+        cursor = db.monitored_endpoints.find(
+            {"is_active": True}, ENDPOINT_CONFIG_PROJECTION
+        ).batch_size(settings.STARTUP_LOAD_BATCH_SIZE)
+        batch = []
         try:
-            scheduler.add_job(
-                cleanup_logs,
-                "interval",
-                days=1,
-                id="cleanup_logs_daily",
-                replace_existing=True
-            )
+            async for endpoint in cursor:
+                batch.append(endpoint)
+                if len(batch) >= settings.STARTUP_LOAD_BATCH_SIZE:
+                    MonitoringService._register_batch(batch)
+                    batch = []
+            MonitoringService._register_batch(batch)
         except Exception as e:
-            print(f"Failed to schedule cleanup job: {e}")
+            stats["state"] = "failed"
+            print(f"Loading jobs failed after {stats['endpoints']} endpoints: {e}")
+            return
+
+        stats["state"] = "done"
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        print(
+            f"Loaded {stats['endpoints']} active endpoints ({stats['jobs']} scheduled here) "
+            f"in {stats['batches']} batches, {stats['seconds']}s"
+        )
 
     @staticmethod
-    async def load_jobs_from_db():
-        scheduler.remove_all_jobs()
-        # Re-add cleanup
-        MonitoringService.start_scheduler() # Ensures cleanup is there
-        
-        async for endpoint in db.monitored_endpoints.find({"is_active": True}):
+    def _register_batch(endpoints: List[dict]):
+        if not endpoints:
+            return
+        owned = []
+        for endpoint in endpoints:
+            endpoint_id = str(endpoint["_id"])
+            # A write or change event that landed during the load is newer than our read
+            if endpoint_cache.peek(endpoint_id) is None:
+                endpoint_cache.put(endpoint)
+            if shard_manager.owns(endpoint_id):
+                owned.append(endpoint)
+        MonitoringService.add_jobs(owned)
+        stats = MonitoringService.startup_stats
+        stats["endpoints"] += len(endpoints)
+        stats["jobs"] += len(owned)
+        stats["batches"] += 1
+
+    @staticmethod
+    async def rebalance():
+        """
+        Drops endpoints this worker no longer owns and picks up newly assigned ones.
+        """
+        acquired = []
+        for endpoint_id, endpoint in endpoint_cache.items():
+            if not endpoint.get("is_active"):
+                continue
+            if shard_manager.owns(endpoint_id):
+                if not check_scheduler.has_job(endpoint_id):
+                    acquired.append(ObjectId(endpoint_id))
+            else:
+                MonitoringService.remove_job(endpoint_id)
+                state_store.discard(endpoint_id)
+
+        if not acquired:
+            return
+
+        # Re-read so the threshold flag reflects the previous owner's last write;
+        # dropping the state makes the next check re-warm it from the logs
+        endpoints = await db.monitored_endpoints.find({"_id": {"$in": acquired}}).to_list(None)
+        for endpoint in endpoints:
+            endpoint_cache.put(endpoint)
+            state_store.discard(str(endpoint["_id"]))
+        MonitoringService.add_jobs([e for e in endpoints if e.get("is_active")])
+
+    @staticmethod
+    def on_endpoint_changed(endpoint_id: str, endpoint: Optional[dict]):
+        """
+        Keeps jobs in sync with config changes made by other processes.
+        """
+        if endpoint and endpoint.get("is_active"):
+            state_store.get_or_create(endpoint)
             MonitoringService.add_job(endpoint)
+        else:
+            MonitoringService.remove_job(endpoint_id)
+            state_store.discard(endpoint_id)
+        if endpoint is None:
+            ownership_cache.pop(endpoint_id)
+            assertion_cache.pop(endpoint_id)
 
     @staticmethod
     def add_job(endpoint: dict):
         endpoint_id = str(endpoint["_id"])
-        interval = endpoint.get("interval", 60)
-        
-        try:
-            scheduler.remove_job(endpoint_id)
-        except JobLookupError:
-            pass
-
-        scheduler.add_job(
-            perform_check, 
-            "interval", 
-            seconds=interval, 
-            args=[endpoint_id], 
-            id=endpoint_id,
-            replace_existing=True
+        if not shard_manager.owns(endpoint_id):
+            check_scheduler.remove(endpoint_id)
+            return
+        check_scheduler.add(*MonitoringService.job_spec(endpoint))
+
+    @staticmethod
+    def add_jobs(endpoints: List[dict]):
+        """
+        Schedules many endpoints in one scheduler batch, skipping those owned by other workers.
+        """
+        check_scheduler.add_many(
+            MonitoringService.job_spec(e) for e in endpoints if shard_manager.owns(str(e["_id"]))
+        )
+
+    @staticmethod
+    def job_spec(endpoint: dict):
+        """
+        (endpoint_id, interval, url, timeout, down) for the check scheduler.
+        """
+        return (
+            str(endpoint["_id"]),
+            endpoint.get("interval", 60),
+            endpoint.get("url", ""),
+            endpoint.get("timeout", 5),
+            bool(endpoint.get("is_threshold_down")),
         )
 
     @staticmethod
     def remove_job(endpoint_id: str):
-        try:
-            scheduler.remove_job(endpoint_id)
-        except JobLookupError:
-            pass
+        check_scheduler.remove(endpoint_id)
+
+endpoint_cache.add_listener(MonitoringService.on_endpoint_changed)
+shard_manager.set_rebalance_handler(MonitoringService.rebalance)
 
 # --- Endpoint Service ---
+DASHBOARD_SPARKLINE_HOURS = 24
+
+# user_email -> (etag, payload); short-lived so repeated polls skip Mongo entirely
+dashboard_cache = TTLCache(maxsize=10000, ttl=settings.DASHBOARD_CACHE_TTL)
+
+# endpoint_id -> owner_email; lets read-only routes skip the ownership query
+ownership_cache = TTLCache(maxsize=settings.OWNERSHIP_CACHE_SIZE, ttl=settings.OWNERSHIP_CACHE_TTL)
+
+def as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Stored timestamps are naive UTC; normalize timezone-aware query params to match.
+    """
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+# --- Log pagination & export ---
+LOG_EXPORT_BATCH_SIZE = 1000
+LOG_EXPORT_COLUMNS = [
+    "id", "endpoint_id", "checked_at", "success", "status_code", "response_time_ms", "error",
+    "dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "total_ms", "reused_connection",
+]
+
+def encode_log_cursor(log: dict) -> str:
+    """
+    Opaque keyset cursor for the (checked_at, _id) position of a log.
+    """
+    raw = f"{log['checked_at'].isoformat()}|{log['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_log_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        checked_at, _, log_id = raw.partition("|")
+        return datetime.fromisoformat(checked_at), ObjectId(log_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def log_query(endpoint_id: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    query: Dict[str, Any] = {"endpoint_id": endpoint_id}
+    time_range = {}
+    if start is not None:
+        time_range["$gte"] = as_naive_utc(start)
+    if end is not None:
+        time_range["$lt"] = as_naive_utc(end)
+    if time_range:
+        query["checked_at"] = time_range
+    return query
+
+def log_row(log: dict) -> Dict[str, Any]:
+    timings = log.get("timings") or {}
+    return {
+        "id": str(log["_id"]),
+        "endpoint_id": log["endpoint_id"],
+        "checked_at": log["checked_at"].isoformat(),
+        "success": log["success"],
+        "status_code": log.get("status_code"),
+        "response_time_ms": log.get("response_time_ms"),
+        "error": log.get("error"),
+        "dns_ms": timings.get("dns_ms"),
+        "connect_ms": timings.get("connect_ms"),
+        "tls_ms": timings.get("tls_ms"),
+        "ttfb_ms": timings.get("ttfb_ms"),
+        "total_ms": timings.get("total_ms"),
+        "reused_connection": timings.get("reused_connection"),
+    }
+
+# --- Bulk import ---
+BULK_MAX_ROWS = 10000
+# CSV cells holding JSON objects
+BULK_JSON_COLUMNS = ("headers", "body", "assertions")
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+def parse_import_rows(content: bytes, filename: str) -> List[dict]:
+    """
+    Parses an uploaded JSON array or CSV file into bulk operations. Rows with
+    an `id` update that endpoint; the others create new ones. Empty CSV cells
+    are left unset so model defaults apply.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+
+    if filename.lower().endswith(".json") or text.lstrip().startswith("["):
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="JSON upload must be an array of endpoints")
+        refs = [f"row {i}" for i in range(len(rows))]
+    else:
+        rows, refs = [], []
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            parsed = {}
+            for key, value in row.items():
+                if key is None or value is None or value.strip() == "":
+                    continue
+                key, value = key.strip(), value.strip()
+                if key in BULK_JSON_COLUMNS:
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        pass  # left as a string so validation reports it
+                parsed[key] = value
+            rows.append(parsed)
+            refs.append(f"line {reader.line_num}")
+
+    operations = []
+    for ref, row in zip(refs, rows):
+        if isinstance(row, dict) and row.get("id"):
+            data = dict(row)
+            operations.append({"op": "update", "ref": ref, "id": str(data.pop("id")), "data": data})
+        else:
+            operations.append({"op": "create", "ref": ref, "data": row})
+    return operations
+
 class EndpointService:
     @staticmethod
     async def create_endpoint(endpoint: EndpointCreate, user_email: str):
         endpoint_dict = endpoint.model_dump()
         endpoint_dict["created_at"] = datetime.utcnow()
+        endpoint_dict["updated_at"] = endpoint_dict["created_at"]
         endpoint_dict["last_checked"] = None
         endpoint_dict["owner_email"] = user_email
         endpoint_dict["last_status_success"] = None
@@ -346,6 +517,8 @@ class EndpointService:
         
         new_endpoint = await db.monitored_endpoints.insert_one(endpoint_dict)
         created_endpoint = await db.monitored_endpoints.find_one({"_id": new_endpoint.inserted_id})
+        endpoint_cache.put(created_endpoint)
+        dashboard_cache.pop(user_email)
         
         if created_endpoint["is_active"]:
             MonitoringService.add_job(created_endpoint)
@@ -368,27 +541,54 @@ class EndpointService:
         
         if not endpoint:
             raise HTTPException(status_code=404, detail="Endpoint not found")
+        ownership_cache.set(id, user_email)
         return endpoint
 
+    @staticmethod
+    async def verify_ownership(id: str, user_email: str):
+        """
+        Raises like get_endpoint_by_id unless the user owns the endpoint, using
+        the ownership cache for routes that do not need the document itself.
+        """
+        if ownership_cache.get(id) == user_email:
+            return
+        if not ObjectId.is_valid(id):
+            raise HTTPException(status_code=400, detail="Invalid ID format")
+        endpoint = await db.monitored_endpoints.find_one(
+            {"_id": ObjectId(id), "owner_email": user_email}, {"_id": 1}
+        )
+        if not endpoint:
+            raise HTTPException(status_code=404, detail="Endpoint not found")
+        ownership_cache.set(id, user_email)
+
     @staticmethod
     async def update_endpoint(id: str, endpoint_update: EndpointUpdate, user_email: str):
         # Verify existence and ownership
-        await EndpointService.get_endpoint_by_id(id, user_email)
+        existing = await EndpointService.get_endpoint_by_id(id, user_email)
         
         update_data = {k: v for k, v in endpoint_update.model_dump().items() if v is not None}
+        window, failures = threshold_settings({**existing, **update_data})
+        if failures > window:
+            raise HTTPException(status_code=400, detail="threshold_failures cannot exceed threshold_window")
         
         if len(update_data) >= 1:
+            update_data["updated_at"] = datetime.utcnow()
             await db.monitored_endpoints.update_one(
                 {"_id": ObjectId(id)}, {"$set": update_data}
             )
 
         updated_endpoint = await db.monitored_endpoints.find_one({"_id": ObjectId(id)})
+        endpoint_cache.put(updated_endpoint)
+        ownership_cache.pop(id)
+        dashboard_cache.pop(user_email)
         
         # Update scheduler
         if updated_endpoint["is_active"]:
+            state_store.get_or_create(updated_endpoint)
             MonitoringService.add_job(updated_endpoint)
         else:
             MonitoringService.remove_job(str(updated_endpoint["_id"]))
+            state_store.discard(str(updated_endpoint["_id"]))
             
         return updated_endpoint
 
@@ -403,56 +603,407 @@ class EndpointService:
         })
         
         if delete_result.deleted_count == 1:
+            ownership_cache.pop(id)
+            assertion_cache.pop(id)
             MonitoringService.remove_job(id)
+            state_store.discard(id)
+            endpoint_cache.invalidate(id)
+            await endpoint_cache.record_deletes([id])
+            dashboard_cache.pop(user_email)
         else:
             raise HTTPException(status_code=404, detail="Endpoint not found")
 
     @staticmethod
-    async def get_logs(endpoint_id: str, user_email: str, limit: int = 50):
+    async def bulk_apply(operations: List[dict], user_email: str):
+        """
+        Applies many create/update/delete operations with one insert_many, one
+        bulk_write and one delete_many, then schedules every affected endpoint
+        in a single scheduler batch. Each operation is a dict with `op`, a `ref`
+        used in error reports and `data` and/or `id`; invalid rows are reported
+        individually and never abort the rest.
+        """
+        if len(operations) > BULK_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+
+        outcomes: Dict[int, Optional[str]] = {}
+        now = datetime.utcnow()
+
+        def fail(operation: dict, message: str):
+            outcomes[id(operation)] = message
+
+        # Every update/delete target must belong to the user; one query checks them all
+        target_ids = {
+            op["id"] for op in operations
+            if op["op"] in ("update", "delete") and ObjectId.is_valid(op.get("id") or "")
+        }
+        existing = {}
+        if target_ids:
+            async for doc in db.monitored_endpoints.find(
+                {"_id": {"$in": [ObjectId(i) for i in target_ids]}, "owner_email": user_email}
+            ):
+                existing[str(doc["_id"])] = doc
+
+        inserts: List[dict] = []
+        insert_ops: List[dict] = []
+        updates: List[UpdateOne] = []
+        update_ops: List[dict] = []
+        deletes: List[dict] = []
+
+        for operation in operations:
+            kind = operation["op"]
+            if kind == "create":
+                try:
+                    endpoint = EndpointCreate.model_validate(operation.get("data"))
+                except ValidationError as e:
+                    fail(operation, validation_message(e))
+                    continue
+                doc = endpoint.model_dump()
+                doc.update({
+                    "_id": ObjectId(),
+                    "created_at": now,
+                    "updated_at": now,
+                    "last_checked": None,
+                    "owner_email": user_email,
+                    "last_status_success": None,
+                    "is_threshold_down": False,
+                })
+                operation["id"] = str(doc["_id"])
+                inserts.append(doc)
+                insert_ops.append(operation)
+            elif kind in ("update", "delete"):
+                current = existing.get(operation.get("id") or "")
+                if current is None:
+                    fail(operation, "Endpoint not found")
+                    continue
+                if kind == "delete":
+                    deletes.append(operation)
+                    continue
+                try:
+                    endpoint_update = EndpointUpdate.model_validate(operation.get("data"))
+                except ValidationError as e:
+                    fail(operation, validation_message(e))
+                    continue
+                update_data = {k: v for k, v in endpoint_update.model_dump().items() if v is not None}
+                window, failures = threshold_settings({**current, **update_data})
+                if failures > window:
+                    fail(operation, "threshold_failures cannot exceed threshold_window")
+                    continue
+                update_data["updated_at"] = now
+                updates.append(UpdateOne({"_id": current["_id"], "owner_email": user_email}, {"$set": update_data}))
+                update_ops.append(operation)
+            else:
+                fail(operation, f"Unknown operation '{kind}'")
+
+        failed_inserts = set()
+        if inserts:
+            try:
+                await db.monitored_endpoints.insert_many(inserts, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed_inserts.add(error["index"])
+                    fail(insert_ops[error["index"]], error.get("errmsg", "Write failed"))
+                    insert_ops[error["index"]]["id"] = None
+
+        failed_updates = set()
+        if updates:
+            try:
+                await db.monitored_endpoints.bulk_write(updates, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed_updates.add(error["index"])
+                    fail(update_ops[error["index"]], error.get("errmsg", "Write failed"))
+
+        if deletes:
+            await db.monitored_endpoints.delete_many(
+                {"_id": {"$in": [ObjectId(op["id"]) for op in deletes]}, "owner_email": user_email}
+            )
+
+        created = [op for i, op in enumerate(insert_ops) if i not in failed_inserts]
+        updated = [op for i, op in enumerate(update_ops) if i not in failed_updates]
+        for op in created + updated + deletes:
+            outcomes[id(op)] = None
+
+        # Sync caches and the scheduler once for the whole batch
+        for op in deletes:
+            ownership_cache.pop(op["id"])
+            assertion_cache.pop(op["id"])
+            endpoint_cache.invalidate(op["id"])
+            MonitoringService.remove_job(op["id"])
+            state_store.discard(op["id"])
+        await endpoint_cache.record_deletes([op["id"] for op in deletes])
+
+        changed_ids = [ObjectId(op["id"]) for op in created + updated]
+        changed = await db.monitored_endpoints.find({"_id": {"$in": changed_ids}}).to_list(None) if changed_ids else []
+        active = []
+        for endpoint in changed:
+            endpoint_id = str(endpoint["_id"])
+            endpoint_cache.put(endpoint)
+            ownership_cache.pop(endpoint_id)
+            if endpoint.get("is_active"):
+                state_store.get_or_create(endpoint)
+                active.append(endpoint)
+            else:
+                MonitoringService.remove_job(endpoint_id)
+                state_store.discard(endpoint_id)
+        MonitoringService.add_jobs(active)
+        dashboard_cache.pop(user_email)
+
+        results = [
+            {"ref": op["ref"], "op": op["op"], "id": op.get("id"), "error": outcomes.get(id(op))}
+            for op in operations
+        ]
+        return {
+            "created": len(created),
+            "updated": len(updated),
+            "deleted": len(deletes),
+            "failed": sum(1 for r in results if r["error"]),
+            "results": results,
+        }
+
+    @staticmethod
+    async def get_logs(
+        endpoint_id: str,
+        user_email: str,
+        limit: int = 50,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+    ):
+        """
+        Returns one page of logs, newest first, and the cursor for the next page
+        (None on the last page). Pages are keyed on (checked_at, _id), so deep
+        pages cost the same as the first and concurrent inserts never shift them.
+        """
         # Verify ownership
-        await EndpointService.get_endpoint_by_id(endpoint_id, user_email)
-        
-        logs = await db.monitoring_logs.find(
-            {"endpoint_id": endpoint_id}
-        ).sort("checked_at", -1).limit(limit).to_list(limit)
-        return logs
+        await EndpointService.verify_ownership(endpoint_id, user_email)
+
+        query = log_query(endpoint_id, start, end)
+        if cursor:
+            checked_at, log_id = decode_log_cursor(cursor)
+            query["$or"] = [
+                {"checked_at": {"$lt": checked_at}},
+                {"checked_at": checked_at, "_id": {"$lt": log_id}},
+            ]
+
+        logs = await logs_collection.find(query).sort(
+            [("checked_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        next_cursor = encode_log_cursor(logs[limit - 1]) if len(logs) > limit else None
+        return logs[:limit], next_cursor
 
     @staticmethod
-    async def get_stats(endpoint_id: str, user_email: str):
+    async def export_logs(
+        endpoint_id: str,
+        user_email: str,
+        fmt: str = "ndjson",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        """
+        Checks ownership up front and returns an async iterator of NDJSON or CSV
+        chunks, oldest first. The Motor cursor is consumed batch by batch, so
+        memory stays flat however much history is exported.
+        """
+        await EndpointService.verify_ownership(endpoint_id, user_email)
+        cursor = logs_collection.find(log_query(endpoint_id, start, end)).sort(
+            [("checked_at", 1), ("_id", 1)]
+        ).batch_size(LOG_EXPORT_BATCH_SIZE)
+        return EndpointService._export_chunks(cursor, fmt)
+
+    @staticmethod
+    async def _export_chunks(cursor, fmt: str):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=LOG_EXPORT_COLUMNS) if fmt == "csv" else None
+        if writer is not None:
+            writer.writeheader()
+        rows = 0
+        try:
+            async for log in cursor:
+                row = log_row(log)
+                if writer is not None:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(row))
+                    buffer.write("\n")
+                rows += 1
+                # One chunk per driver batch keeps writes large and memory bounded
+                if rows % LOG_EXPORT_BATCH_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            await cursor.close()
+
+    @staticmethod
+    async def get_stats(
+        endpoint_id: str,
+        user_email: str,
+        range_key: str = "7d",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
         # Verify ownership
-        await EndpointService.get_endpoint_by_id(endpoint_id, user_email)
-        
-        pipeline = [
-            {"$match": {"endpoint_id": endpoint_id}},
-            {"$group": {
-                "_id": None,
-                "average_response_time": {"$avg": "$response_time_ms"},
-                "total_checks": {"$sum": 1},
-                "successful_checks": {
-                    "$sum": {"$cond": [{"$eq": ["$success", True]}, 1, 0]}
-                }
-            }}
-        ]
-        
-        cursor = db.monitoring_logs.aggregate(pipeline)
-        result = await cursor.to_list(1)
-        
-        if not result:
-            return {
-                "average_response_time": 0,
-                "total_checks": 0,
-                "successful_checks": 0,
-                "uptime_percentage": 0
-            }
-        
-        stats = result[0]
-        total = stats["total_checks"]
-        success = stats["successful_checks"]
+        await EndpointService.verify_ownership(endpoint_id, user_email)
+
+        start, end = as_naive_utc(start), as_naive_utc(end)
+
+        # Read pre-aggregated rollups instead of scanning raw logs
+        if start is not None:
+            end = end or datetime.utcnow()
+            if start >= end:
+                raise HTTPException(status_code=400, detail="start must be before end")
+            summary = await RollupService.summarize_window(endpoint_id, start, end)
+            range_key = None
+        elif range_key in STATS_RANGES:
+            summary = await RollupService.summarize(endpoint_id, range_key)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid range, expected one of: {', '.join(STATS_RANGES)}"
+            )
+
+        total = summary["total"]
+        success = summary["successes"]
         uptime = (success / total * 100) if total > 0 else 0
-        
+        latency_count = summary["latency_count"]
+        average = summary["latency_sum"] / latency_count if latency_count else 0
+
         return {
-            "average_response_time": round(stats["average_response_time"], 2),
+            "range": range_key,
+            "start": start,
+            "end": end,
+            "average_response_time": round(average, 2),
+            "min_response_time": summary["latency_min"],
+            "max_response_time": summary["latency_max"],
             "total_checks": total,
             "successful_checks": success,
-            "uptime_percentage": round(uptime, 2)
+            "uptime_percentage": round(uptime, 2),
+            "latency_histogram": summary["hist"],
+            "error_breakdown": summary["errors"],
+            **percentiles(summary["sketch"]),
         }
+
+    @staticmethod
+    async def get_series(
+        endpoint_id: str,
+        user_email: str,
+        range_key: str = "24h",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        points: int = 300,
+        mode: str = "buckets",
+    ):
+        """
+        Chart-ready latency history sized to `points`, either bucketed
+        (min/avg/max/p95 and failure counts) or LTTB-downsampled raw checks.
+        """
+        await EndpointService.verify_ownership(endpoint_id, user_email)
+
+        if mode not in SERIES_MODES:
+            raise HTTPException(status_code=400, detail=f"Invalid mode, expected one of: {', '.join(SERIES_MODES)}")
+        end = as_naive_utc(end) or datetime.utcnow()
+        start = as_naive_utc(start)
+        if start is None:
+            if range_key not in STATS_RANGES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid range, expected one of: {', '.join(STATS_RANGES)}"
+                )
+            start = end - STATS_RANGES[range_key][0]
+        if start >= end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+
+        if mode == "lttb":
+            series = await SeriesService.downsample(endpoint_id, start, end, points)
+        else:
+            series = await SeriesService.buckets(endpoint_id, start, end, points)
+        return {"start": start, "end": end, **series}
+
+    @staticmethod
+    async def get_dashboard(user_email: str):
+        """
+        Status, 24h uptime/latency and an hourly latency sparkline for all of a
+        user's endpoints, built from rollups in two queries. Returns (etag, payload).
+        """
+        cached = dashboard_cache.get(user_email)
+        if cached is not None:
+            return cached
+
+        endpoints = await db.monitored_endpoints.find(
+            {"owner_email": user_email},
+            {
+                "name": 1, "url": 1, "method": 1, "interval": 1, "is_active": 1,
+                "last_checked": 1, "last_status_success": 1, "is_threshold_down": 1,
+            }
+        ).to_list(None)
+
+        now = datetime.utcnow()
+        first_hour = bucket_start(now - timedelta(hours=DASHBOARD_SPARKLINE_HOURS - 1), "hour")
+        hours = [first_hour + timedelta(hours=i) for i in range(DASHBOARD_SPARKLINE_HOURS)]
+        rollups = await RollupService.read_many([str(e["_id"]) for e in endpoints], "hour", first_hour)
+
+        items = []
+        up = down = pending = 0
+        latency_sum = latency_count = 0
+        for endpoint in endpoints:
+            endpoint_id = str(endpoint["_id"])
+            docs = rollups.get(endpoint_id, [])
+            summary = merge_rollups(docs)
+            by_hour = {doc["bucket_start"]: doc for doc in docs}
+
+            # Prefer the live in-memory threshold state when this worker runs the check
+            state = state_store.get(endpoint_id)
+            threshold_down = state.is_threshold_down if state else endpoint.get("is_threshold_down", False)
+
+            last_success = endpoint.get("last_status_success")
+            if last_success is None:
+                pending += 1
+            elif last_success:
+                up += 1
+            else:
+                down += 1
+            latency_sum += summary["latency_sum"]
+            latency_count += summary["latency_count"]
+
+            total = summary["total"]
+            items.append({
+                "_id": endpoint_id,
+                "name": endpoint.get("name"),
+                "url": endpoint.get("url"),
+                "method": endpoint.get("method", "GET"),
+                "interval": endpoint.get("interval"),
+                "is_active": endpoint.get("is_active", True),
+                "last_checked": endpoint.get("last_checked"),
+                "last_status_success": last_success,
+                "is_threshold_down": threshold_down,
+                "uptime_percentage": round(summary["successes"] / total * 100, 2) if total else None,
+                "average_response_time": (
+                    round(summary["latency_sum"] / summary["latency_count"], 2)
+                    if summary["latency_count"] else None
+                ),
+                "p95_response_time": percentiles(summary["sketch"])["p95"],
+                "sparkline": [
+                    round(by_hour[hour]["latency_sum"] / by_hour[hour]["latency_count"], 2)
+                    if hour in by_hour and by_hour[hour].get("latency_count") else None
+                    for hour in hours
+                ],
+            })
+
+        payload = jsonable_encoder({
+            "summary": {
+                "total": len(endpoints),
+                "up": up,
+                "down": down,
+                "pending": pending,
+                "average_response_time": round(latency_sum / latency_count, 2) if latency_count else None,
+            },
+            "sparkline_start": first_hour,
+            "sparkline_step_seconds": 3600,
+            "endpoints": items,
+        })
+        digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        result = (f'W/"{digest}"', payload)
+        dashboard_cache.set(user_email, result)
+        return result
@@ -0,0 +1,192 @@
+import os
+import uuid
+import socket
+import bisect
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional, List, Callable, Awaitable, FrozenSet
+
+from config import settings
+from models import db
+
+
+def release_after() -> float:
+    """
+    Seconds without a successful renewal after which a worker gives up its
+    endpoints: two heartbeats short of the lease TTL, since the failure is
+    only noticed on a beat and that beat may itself run late.
+    """
+    return settings.SHARD_LEASE_TTL - 2 * settings.SHARD_HEARTBEAT_INTERVAL
+
+
+def membership_view(members: FrozenSet[str]) -> str:
+    """
+    Short digest of a membership, stored on each lease once the worker has applied it.
+    """
+    return hashlib.blake2b("\n".join(sorted(members)).encode(), digest_size=8).hexdigest()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes; adding or removing a worker only
+    moves the endpoints that hashed to that worker's slots.
+    """
+
+    def __init__(self, workers: List[str], vnodes: int):
+        self._keys: List[int] = []
+        self._owners: List[str] = []
+        points = sorted(
+            (_hash(f"{worker}#{i}"), worker) for worker in workers for i in range(vnodes)
+        )
+        for point, worker in points:
+            self._keys.append(point)
+            self._owners.append(worker)
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[index]
+
+
+class ShardManager:
+    """
+    Partitions active endpoints across worker processes.
+
+    Each worker keeps a lease document in `worker_leases` alive with a
+    heartbeat. The set of unexpired leases forms a consistent hash ring; a
+    worker only schedules endpoints that hash to it and rebalances whenever
+    the membership changes. Slots are dropped as soon as a worker sees a new
+    membership but only taken over once every live worker has acknowledged
+    it (the `view` on its lease), so two workers never check the same
+    endpoint while the others have not rebalanced yet. A worker that cannot
+    renew its lease releases all of its endpoints two heartbeats before the
+    lease expires for everyone else, for the same reason.
+    """
+
+    def __init__(self):
+        self.worker_id = settings.WORKER_ID or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.members: FrozenSet[str] = frozenset()
+        self._ring = HashRing([], settings.SHARD_VNODES)
+        # Ring every live worker has acknowledged; slots gained since are held back
+        self._settled = self._ring
+        self._view: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_renewed: Optional[datetime] = None
+        self._on_rebalance: Optional[Callable[[], Awaitable[None]]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SHARDING_ENABLED
+
+    def set_rebalance_handler(self, handler: Callable[[], Awaitable[None]]):
+        self._on_rebalance = handler
+
+    def owns(self, endpoint_id: str) -> bool:
+        if not self.enabled:
+            return True
+        if self._ring.owner(endpoint_id) != self.worker_id:
+            return False
+        return self._settled is self._ring or self._settled.owner(endpoint_id) == self.worker_id
+
+    @property
+    def settled(self) -> bool:
+        return self._settled is self._ring
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        await self._heartbeat()
+        self._task = asyncio.create_task(self._run())
+        print(f"Sharding enabled: worker {self.worker_id} sees {len(self.members)} worker(s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Give up our lease immediately so the others rebalance on their next beat
+        try:
+            await db.worker_leases.delete_one({"_id": self.worker_id})
+        except Exception as e:
+            print(f"Failed to release worker lease: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.SHARD_HEARTBEAT_INTERVAL)
+            await self._heartbeat()
+
+    async def _heartbeat(self):
+        now = datetime.utcnow()
+        try:
+            await db.worker_leases.update_one(
+                {"_id": self.worker_id},
+                {"$set": {
+                    "host": socket.gethostname(),
+                    "pid": os.getpid(),
+                    "heartbeat_at": now,
+                    "expires_at": now + timedelta(seconds=settings.SHARD_LEASE_TTL),
+                    "view": self._view,
+                }},
+                upsert=True,
+            )
+            self._last_renewed = now
+            leases = [
+                doc async for doc in db.worker_leases.find({"expires_at": {"$gt": now}}, {"_id": 1, "view": 1})
+            ]
+        except Exception as e:
+            print(f"Worker lease heartbeat failed: {e}")
+            expired = self._last_renewed is None or (
+                now - self._last_renewed > timedelta(seconds=release_after())
+            )
+            if not expired:
+                return
+            # Our lease lapses before the next beat could renew it and another
+            # worker may own our endpoints by then, so stop checking them now
+            leases = []
+
+        members = frozenset(doc["_id"] for doc in leases)
+        changed = members != self.members
+        if changed:
+            self.members = members
+            self._ring = HashRing(sorted(members), settings.SHARD_VNODES)
+            print(f"Shard membership changed: {len(members)} worker(s) active")
+
+        view = membership_view(members)
+        was_settled = self.settled
+        if all(doc["_id"] == self.worker_id or doc.get("view") == view for doc in leases):
+            self._settled = self._ring
+        # Lost slots are dropped on the change itself, gained ones once it settles
+        if self._on_rebalance is not None and (changed or (self.settled and not was_settled)):
+            try:
+                await self._on_rebalance()
+            except Exception as e:
+                print(f"Shard rebalance failed: {e}")
+
+        if view != self._view and members:
+            # Acknowledge the new membership only after our lost slots are dropped
+            self._view = view
+            try:
+                await db.worker_leases.update_one({"_id": self.worker_id}, {"$set": {"view": view}})
+            except Exception as e:
+                print(f"Failed to acknowledge shard membership: {e}")
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "worker_id": self.worker_id,
+            "workers": len(self.members),
+            "settled": self.settled,
+        }
+
+
+shard_manager = ShardManager()
@@ -0,0 +1,84 @@
+import math
+from typing import Dict, Optional
+
+# Fixed for every writer: sketches are only mergeable if they share gamma
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Values at or below this (in ms) go to the zero bucket
+MIN_INDEXABLE = 1e-3
+
+
+def sketch_key(value: float) -> Optional[int]:
+    """
+    Bucket index for a value, or None for the zero bucket.
+    """
+    if value <= MIN_INDEXABLE:
+        return None
+    return math.ceil(math.log(value) / LOG_GAMMA)
+
+
+class DDSketch:
+    """
+    DDSketch-style quantile sketch with logarithmic buckets.
+
+    Any quantile is answered within RELATIVE_ACCURACY of the true value.
+    Buckets are plain counters keyed by index, so two sketches merge by adding
+    counts; that is what lets rollups `$inc` them across time buckets and
+    workers. Stored compactly as {"z": zero_count, "b": {"<index>": count}}.
+    """
+
+    __slots__ = ("bins", "zero_count", "count")
+
+    def __init__(self, bins: Optional[Dict[int, int]] = None, zero_count: int = 0):
+        self.bins: Dict[int, int] = dict(bins or {})
+        self.zero_count = zero_count
+        self.count = zero_count + sum(self.bins.values())
+
+    def add(self, value: float, count: int = 1):
+        key = sketch_key(value)
+        if key is None:
+            self.zero_count += count
+        else:
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+
+    def merge(self, other: "DDSketch"):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * GAMMA ** key / (GAMMA + 1)
+        return 2 * GAMMA ** max(self.bins) / (GAMMA + 1)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"z": self.zero_count, "b": {str(k): v for k, v in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, object]]) -> "DDSketch":
+        if not data:
+            return cls()
+        return cls({int(k): v for k, v in (data.get("b") or {}).items()}, data.get("z", 0))
+
+
+def percentiles(sketch: DDSketch) -> Dict[str, Optional[float]]:
+    def _round(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "p50": _round(sketch.quantile(0.50)),
+        "p95": _round(sketch.quantile(0.95)),
+        "p99": _round(sketch.quantile(0.99)),
+    }
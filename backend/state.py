@@ -0,0 +1,141 @@
+from array import array
+from typing import Dict, Optional
+
+from models import logs_collection
+from log_writer import log_writer
+
+DEFAULT_THRESHOLD_WINDOW = 5
+DEFAULT_THRESHOLD_FAILURES = 4
+
+
+class EndpointState:
+    """
+    Ring buffer of the most recent check outcomes for one endpoint.
+
+    Outcomes are stored as bytes (1 = failure) and the failure count is kept
+    incrementally, so recording a check and evaluating the threshold is O(1).
+    """
+
+    __slots__ = ("outcomes", "cursor", "size", "failure_count", "threshold_failures", "is_threshold_down", "warmed")
+
+    def __init__(
+        self,
+        window: int = DEFAULT_THRESHOLD_WINDOW,
+        threshold_failures: int = DEFAULT_THRESHOLD_FAILURES,
+        is_threshold_down: bool = False,
+    ):
+        self.outcomes = array("b", bytes(window))
+        self.cursor = 0
+        self.size = 0
+        self.failure_count = 0
+        self.threshold_failures = threshold_failures
+        self.is_threshold_down = is_threshold_down
+        self.warmed = False
+
+    @property
+    def window(self) -> int:
+        return len(self.outcomes)
+
+    def push(self, success: bool):
+        failed = 0 if success else 1
+        if self.size == self.window:
+            self.failure_count -= self.outcomes[self.cursor]
+        else:
+            self.size += 1
+        self.outcomes[self.cursor] = failed
+        self.failure_count += failed
+        self.cursor = (self.cursor + 1) % self.window
+
+    def recent(self):
+        """
+        Returns outcomes oldest first as booleans (True = success).
+        """
+        start = (self.cursor - self.size) % self.window
+        return [not self.outcomes[(start + i) % self.window] for i in range(self.size)]
+
+    def configure(self, window: int, threshold_failures: int):
+        self.threshold_failures = threshold_failures
+        if window == self.window:
+            return
+        history = self.recent()[-window:]
+        self.outcomes = array("b", bytes(window))
+        self.cursor = 0
+        self.size = 0
+        self.failure_count = 0
+        for success in history:
+            self.push(success)
+
+    def record(self, success: bool) -> bool:
+        """
+        Records a check outcome and returns the new threshold-down flag.
+        """
+        self.push(success)
+        self.is_threshold_down = self.failure_count >= self.threshold_failures
+        return self.is_threshold_down
+
+
+def threshold_settings(endpoint: dict):
+    window = endpoint.get("threshold_window") or DEFAULT_THRESHOLD_WINDOW
+    failures = endpoint.get("threshold_failures") or DEFAULT_THRESHOLD_FAILURES
+    return window, failures
+
+
+class StateStore:
+    """
+    In-process store of per-endpoint threshold state, warmed lazily from Mongo.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, EndpointState] = {}
+
+    def get(self, endpoint_id: str) -> Optional[EndpointState]:
+        return self._states.get(endpoint_id)
+
+    def get_or_create(self, endpoint: dict) -> EndpointState:
+        endpoint_id = str(endpoint["_id"])
+        window, failures = threshold_settings(endpoint)
+        state = self._states.get(endpoint_id)
+        if state is None:
+            state = EndpointState(window, failures, endpoint.get("is_threshold_down", False))
+            self._states[endpoint_id] = state
+        else:
+            state.configure(window, failures)
+        return state
+
+    def discard(self, endpoint_id: str):
+        self._states.pop(endpoint_id, None)
+
+    def clear(self):
+        self._states.clear()
+
+    async def ensure_warm(self, endpoint: dict) -> EndpointState:
+        """
+        Returns the endpoint's state, first rebuilding its ring buffer from the
+        most recent logs (stored or still queued for writing) if this process
+        has not done so yet. Warming happens on each endpoint's first check
+        rather than for the whole fleet at startup, so the cost is spread over
+        the check intervals.
+        """
+        state = self.get_or_create(endpoint)
+        if state.warmed:
+            return state
+        endpoint_id = str(endpoint["_id"])
+        last_logs = await logs_collection.find(
+            {"endpoint_id": endpoint_id}, {"success": 1, "checked_at": 1}
+        ).sort("checked_at", -1).limit(state.window).to_list(state.window)
+        # The newest outcomes may still be waiting in the write-behind log writer;
+        # a log being flushed right now can be in both, so skip ids already read
+        stored = {log["_id"] for log in last_logs}
+        pending = [log for log in log_writer.pending_logs(endpoint_id) if log.get("_id") not in stored]
+        recent = sorted(last_logs + pending, key=lambda log: log["checked_at"])[-state.window:]
+
+        state.cursor = 0
+        state.size = 0
+        state.failure_count = 0
+        for log in recent:
+            state.push(log["success"])
+        state.warmed = True
+        return state
+
+
+state_store = StateStore()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Settings are read at import time and SECRET_KEY has no default
+os.environ.setdefault("SECRET_KEY", "test-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
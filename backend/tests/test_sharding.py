@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import sharding
+from config import settings
+
+
+class FakeLeases:
+    """
+    The few `worker_leases` operations ShardManager uses, kept in memory.
+    """
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[query["_id"]] = {"_id": query["_id"]}
+        doc.update(update["$set"])
+
+    async def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+    async def find(self, query, projection=None):
+        for doc in list(self.docs.values()):
+            if doc["expires_at"] > query["expires_at"]["$gt"]:
+                yield dict(doc)
+
+
+class FakeDB:
+    def __init__(self):
+        self.worker_leases = FakeLeases()
+
+
+def make_manager(worker_id):
+    manager = sharding.ShardManager()
+    manager.worker_id = worker_id
+    return manager
+
+
+ENDPOINTS = [f"endpoint-{i}" for i in range(500)]
+
+
+def assert_no_overlap(*managers):
+    for endpoint_id in ENDPOINTS:
+        owners = [m.worker_id for m in managers if m.owns(endpoint_id)]
+        assert len(owners) <= 1, f"{endpoint_id} checked by {owners}"
+
+
+def test_joining_worker_waits_until_slots_are_released(monkeypatch):
+    monkeypatch.setattr(settings, "SHARDING_ENABLED", True)
+    monkeypatch.setattr(sharding, "db", FakeDB())
+
+    async def scenario():
+        a, b = make_manager("worker-a"), make_manager("worker-b")
+        await a._heartbeat()
+        assert all(a.owns(e) for e in ENDPOINTS)
+
+        # b joins and sees both workers, but a still runs the old ring
+        await b._heartbeat()
+        assert_no_overlap(a, b)
+        assert not any(b.owns(e) for e in ENDPOINTS)
+
+        # a drops what moved to b, then acknowledges the new membership
+        await a._heartbeat()
+        assert_no_overlap(a, b)
+
+        # b takes over once every live worker has acknowledged
+        await b._heartbeat()
+        assert_no_overlap(a, b)
+        assert all(a.owns(e) or b.owns(e) for e in ENDPOINTS)
+        assert any(b.owns(e) for e in ENDPOINTS)
+
+    asyncio.run(scenario())
+
+
+def test_slots_of_a_departed_worker_are_taken_over(monkeypatch):
+    monkeypatch.setattr(settings, "SHARDING_ENABLED", True)
+    fake = FakeDB()
+    monkeypatch.setattr(sharding, "db", fake)
+
+    async def scenario():
+        a, b = make_manager("worker-a"), make_manager("worker-b")
+        for manager in (a, b, a, b):
+            await manager._heartbeat()
+        assert all(a.owns(e) or b.owns(e) for e in ENDPOINTS)
+
+        # b's lease expires without a goodbye
+        fake.worker_leases.docs["worker-b"]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+        await a._heartbeat()
+        assert all(a.owns(e) for e in ENDPOINTS)
+
+    asyncio.run(scenario())
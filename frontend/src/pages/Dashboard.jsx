@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { endpointAPI } from "../services/api";
+import { endpointAPI, dashboardAPI, subscribeToStream } from "../services/api";
 import { Activity, Plus, Trash2, ExternalLink, RefreshCw, BarChart2 } from "lucide-react";
 
 export default function Dashboard() {
@@ -12,8 +12,9 @@ export default function Dashboard() {
 
   const fetchEndpoints = async () => {
     try {
-      const response = await endpointAPI.list();
-      setEndpoints(response.data);
+      // One batched call; unchanged polls are answered with 304 via the ETag
+      const response = await dashboardAPI.get();
+      setEndpoints(response.data.endpoints);
     } catch (err) {
       console.error("Failed to fetch endpoints", err);
     } finally {
@@ -23,8 +24,23 @@ export default function Dashboard() {
 
   useEffect(() => {
     fetchEndpoints();
-    const interval = setInterval(fetchEndpoints, 30000);
-    return () => clearInterval(interval);
+    // Status changes are pushed; the slow poll only refreshes uptime/latency figures
+    const close = subscribeToStream({
+      check: (event) =>
+        setEndpoints((current) =>
+          current.map((ep) =>
+            (ep._id || ep.id) === event.endpoint_id
+              ? { ...ep, last_status_success: event.success, last_checked: event.checked_at }
+              : ep
+          )
+        ),
+      transition: fetchEndpoints,
+    });
+    const interval = setInterval(fetchEndpoints, 300000);
+    return () => {
+      close();
+      clearInterval(interval);
+    };
   }, []);
 
   const handleAddEndpoint = async (e) => {
@@ -91,7 +107,12 @@ export default function Dashboard() {
                   )}
                 </div>
                 
-                <div className="flex items-center justify-between mt-8">
+                <div className="flex gap-4 mt-4 text-xs text-gray-500 dark:text-gray-400">
+                  <span>Uptime 24h: {ep.uptime_percentage ?? "—"}{ep.uptime_percentage != null && "%"}</span>
+                  <span>p95: {ep.p95_response_time != null ? `${Math.round(ep.p95_response_time)}ms` : "—"}</span>
+                </div>
+
+                <div className="flex items-center justify-between mt-4">
                   <div className="flex gap-2">
                     <span className="text-xs bg-gray-50 dark:bg-gray-700 px-2 py-1 rounded border dark:border-gray-600 text-gray-600 dark:text-gray-300 font-mono">{ep.method}</span>
                     <span className="text-xs bg-gray-50 dark:bg-gray-700 px-2 py-1 rounded border dark:border-gray-600 text-gray-600 dark:text-gray-300">{ep.interval}s</span>
@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { useParams, Link } from "react-router-dom";
-import { endpointAPI } from "../services/api";
+import { endpointAPI, subscribeToStream } from "../services/api";
 import { Line } from "react-chartjs-2";
 import { Chart as ChartJS, CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend, Filler } from "chart.js";
 import { ArrowLeft, Clock, CheckCircle, XCircle, RefreshCw, Settings, Save } from "lucide-react";
@@ -13,20 +13,23 @@ export default function EndpointDetails() {
   const [endpoint, setEndpoint] = useState(null);
   const [stats, setStats] = useState(null);
   const [logs, setLogs] = useState([]);
+  const [series, setSeries] = useState([]);
   const [loading, setLoading] = useState(true);
   const [updating, setUpdating] = useState(false);
   const [editData, setEditData] = useState({ slack_webhook_url: "", alert_email: "" });
 
   const fetchData = async () => {
     try {
-      const [epRes, statsRes, logsRes] = await Promise.all([
+      const [epRes, statsRes, logsRes, seriesRes] = await Promise.all([
         endpointAPI.get(id),
         endpointAPI.getStats(id),
         endpointAPI.getLogs(id),
+        endpointAPI.getSeries(id, { range: "24h", points: 144 }),
       ]);
       setEndpoint(epRes.data);
       setStats(statsRes.data);
       setLogs(logsRes.data);
+      setSeries(seriesRes.data.buckets);
       setEditData({ 
         slack_webhook_url: epRes.data.slack_webhook_url || "",
         alert_email: epRes.data.alert_email || ""
@@ -53,8 +56,22 @@ export default function EndpointDetails() {
 
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 15000);
-    return () => clearInterval(interval);
+    // New checks are pushed over the stream; stats refresh on transitions and slowly otherwise
+    const close = subscribeToStream({
+      check: (event) => {
+        if (event.endpoint_id !== id) return;
+        setLogs((current) => [{ ...event, id: `${event.endpoint_id}-${event.checked_at}` }, ...current].slice(0, 50));
+        setEndpoint((current) => current && { ...current, last_status_success: event.success, last_checked: event.checked_at });
+      },
+      transition: (event) => {
+        if (event.endpoint_id === id) fetchData();
+      },
+    });
+    const interval = setInterval(fetchData, 300000);
+    return () => {
+      close();
+      clearInterval(interval);
+    };
   }, [id]);
 
   if (loading) return (
@@ -64,20 +81,35 @@ export default function EndpointDetails() {
   );
   if (!endpoint) return <div className="p-8 text-center dark:text-white">Endpoint not found</div>;
 
-  const chartLogs = [...logs].reverse();
-  const filteredChartLogs = chartLogs.filter(log => log.success && log.response_time_ms > 0);
-  
+  // 24h of server-side buckets; latency only covers successful checks and
+  // failures are plotted separately instead of as 0ms points
   const chartData = {
-    labels: filteredChartLogs.map((log) => format(new Date(log.checked_at), "HH:mm:ss")),
+    labels: series.map((bucket) => format(new Date(bucket.t), "HH:mm")),
     datasets: [
       {
-        label: "Response Time (ms)",
-        data: filteredChartLogs.map((log) => log.response_time_ms),
+        label: "Avg Response Time (ms)",
+        data: series.map((bucket) => bucket.avg),
         borderColor: "rgb(79, 70, 229)",
         backgroundColor: "rgba(79, 70, 229, 0.5)",
         tension: 0.2,
         fill: true,
       },
+      {
+        label: "p95 (ms)",
+        data: series.map((bucket) => bucket.p95),
+        borderColor: "rgb(245, 158, 11)",
+        backgroundColor: "rgba(245, 158, 11, 0.2)",
+        tension: 0.2,
+        pointRadius: 0,
+      },
+      {
+        label: "Failed Checks",
+        data: series.map((bucket) => bucket.failures || null),
+        borderColor: "rgb(239, 68, 68)",
+        backgroundColor: "rgb(239, 68, 68)",
+        showLine: false,
+        yAxisID: "failures",
+      },
     ],
   };
 
@@ -131,7 +163,7 @@ export default function EndpointDetails() {
       <div className="grid grid-cols-1 lg:grid-cols-3 gap-8">
         <div className="lg:col-span-2 bg-white dark:bg-gray-800 shadow-lg rounded-2xl p-6 transition-colors duration-200">
           <h2 className="text-xl font-bold mb-6 flex items-center gap-2 dark:text-white">
-            <Clock className="text-indigo-600 dark:text-indigo-400" /> Response Time History
+            <Clock className="text-indigo-600 dark:text-indigo-400" /> Response Time (24h)
           </h2>
           <div className="h-[400px]">
             <Line 
@@ -148,6 +180,12 @@ export default function EndpointDetails() {
                   x: {
                     grid: { color: 'rgba(156, 163, 175, 0.1)' },
                     ticks: { color: 'rgb(156, 163, 175)' }
+                  },
+                  failures: {
+                    position: 'right',
+                    beginAtZero: true,
+                    grid: { display: false },
+                    ticks: { color: 'rgb(239, 68, 68)', precision: 0 }
                   }
                 },
                 plugins: {
@@ -42,6 +42,23 @@ export const endpointAPI = {
   delete: (id) => api.delete(`/endpoints/${id}`),
   getStats: (id) => api.get(`/stats/${id}`),
   getLogs: (id) => api.get(`/logs/${id}`),
+  getSeries: (id, params = {}) => api.get(`/series/${id}`, { params }),
+};
+
+export const dashboardAPI = {
+  get: () => api.get("/dashboard"),
+};
+
+// Live check results over Server-Sent Events. EventSource cannot send
+// headers, so the token goes in the query string. Returns a close function.
+export const subscribeToStream = (handlers) => {
+  const token = localStorage.getItem("token");
+  const url = `${API_BASE_URL}/stream${token ? `?token=${encodeURIComponent(token)}` : ""}`;
+  const source = new EventSource(url);
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+  return () => source.close();
 };
 
 export default api;